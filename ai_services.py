@@ -1,41 +1,121 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import io
 import time
 import pygame
 import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
-from array import array
 from pygame import mixer
 import base64
 import re
 import os
 import traceback
-import uuid
 import sys
+import gzip
+import queue
+import hashlib
+import http.client
+import urllib.parse
+import struct
+import subprocess
+import atexit
+import heapq
+import itertools
+import shutil
+import tempfile
 
 # Debug mode for detailed logging
 DEBUG_MODE = os.environ.get('AI_DEBUG', '0') == '1'
 
-# Initialize pygame mixer for audio playback
-try:
-    pygame.mixer.quit()  # Reset mixer if already initialized
-    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=4096)
-    debug_log = print if DEBUG_MODE else lambda *args, **kwargs: None
-    print(f"Pygame mixer initialized: {pygame.mixer.get_init()}")
-except Exception as e:
-    print(f"Warning: Could not initialize pygame mixer: {e}")
-    debug_log = print if DEBUG_MODE else lambda *args, **kwargs: None
+# Headless mode uses SDL's dummy drivers, so no window or audio device is needed
+HEADLESS_MODE = os.environ.get('GAME_HEADLESS', '0') == '1'
+
+def use_dummy_drivers():
+    """Point SDL at its dummy video and audio drivers. Must run before pygame initializes them."""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+# Target output latency used to pick the mixer buffer size. Smaller buffers answer faster
+# but underrun (crackle) when a frame stalls; AUDIO_BUFFER sets the size outright.
+AUDIO_LATENCY_MS = float(os.environ.get('AUDIO_LATENCY_MS', '40'))
+AUDIO_BUFFER = int(os.environ.get('AUDIO_BUFFER', '0'))
+
+# Buffer size the mixer was opened with (pygame doesn't report it)
+_mixer_buffer = None
+
+def choose_mixer_buffer(frequency, latency_ms=None):
+    """Smallest power-of-two buffer covering the target latency, between 512 and 4096 samples."""
+    if latency_ms is None:
+        latency_ms = AUDIO_LATENCY_MS
+    target = frequency * latency_ms / 1000
+    buffer = 512
+    while buffer < target and buffer < 4096:
+        buffer *= 2
+    return buffer
+
+def mixer_settings():
+    """The mixer's rate, sample size, channels and buffer, or None if it isn't initialized."""
+    mixer_format = pygame.mixer.get_init()
+    if not mixer_format:
+        return None
+    frequency, size, channels = mixer_format
+    return {
+        "frequency": frequency,
+        "size": size,
+        "channels": channels,
+        "buffer": _mixer_buffer,
+        "latency_ms": _mixer_buffer * 1000 / frequency if _mixer_buffer else None,
+    }
+
+def init_audio(frequency=44100, size=-16, channels=2, buffer=None, headless=None):
+    """Initialize the pygame mixer for audio playback. Does nothing if it is already initialized.
+    
+    The device may pick its own rate and channel count, so the mixer runs at the hardware's
+    native format; TTS clips are converted to it once, when they are cached. The buffer size
+    comes from AUDIO_BUFFER or the AUDIO_LATENCY_MS target.
+    """
+    global _mixer_buffer
+    if headless is None:
+        headless = HEADLESS_MODE
+    if headless:
+        use_dummy_drivers()
+
+    if pygame.mixer.get_init():
+        return True
+    if buffer is None:
+        buffer = AUDIO_BUFFER or choose_mixer_buffer(frequency)
+    try:
+        allowed = getattr(pygame, "AUDIO_ALLOW_FREQUENCY_CHANGE", 0) | getattr(pygame, "AUDIO_ALLOW_CHANNELS_CHANGE", 0)
+        pygame.mixer.init(frequency=frequency, size=size, channels=channels, buffer=buffer,
+                          allowedchanges=allowed)
+        _mixer_buffer = buffer
+        settings = mixer_settings()
+        print(f"Pygame mixer initialized: {settings['frequency']} Hz, {abs(settings['size'])}-bit, "
+              f"{settings['channels']} ch, buffer {buffer} ({settings['latency_ms']:.0f} ms)")
+        return True
+    except Exception as e:
+        print(f"Warning: Could not initialize pygame mixer: {e}")
+        return False
 
 # Make PyAudio optional
 try:
     import pyaudio
-    import wave
     PYAUDIO_AVAILABLE = True
 except ImportError:
     print("Warning: PyAudio is not available. Voice input functionality will be disabled.")
     PYAUDIO_AVAILABLE = False
 
+# FLAC encoding of voice uploads is used when soundfile is installed
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
 # Debug logging control - controlled by environment variable AI_DEBUG
 DEBUG_LOGGING = DEBUG_MODE
 
@@ -75,42 +155,1301 @@ def debug_log(message):
     if DEBUG_LOGGING:
         print(message)
 
+def audio_bytes_of(audio_data):
+    """Return audio as a bytes-like object, whether it came as bytes or a file-like buffer."""
+    if isinstance(audio_data, (bytes, bytearray, memoryview)):
+        return audio_data
+    audio_data.seek(0)
+    return audio_data.read()
+
+def read_audio_body(response, chunk_size=64 * 1024):
+    """Read a streamed binary audio response and release its connection.
+    
+    An uncompressed body with a Content-Length is copied into a buffer allocated once at that
+    size. Compressed bodies are decompressed chunk by chunk as they arrive.
+    """
+    try:
+        length = response.headers.get("Content-Length")
+        encoding = response.headers.get("Content-Encoding", "identity").lower()
+        if length and encoding == "identity":
+            buffer = bytearray(int(length))
+            received = 0
+            for chunk in response.iter_content(chunk_size):
+                buffer[received:received + len(chunk)] = chunk
+                received += len(chunk)
+            return buffer if received == len(buffer) else buffer[:received]
+        
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size):
+            buffer += chunk
+        return buffer
+    finally:
+        response.close()
+
+def sniff_audio_format(data):
+    """Name the container of an audio clip from its first bytes: wav, ogg, flac, mp3 or None."""
+    head = bytes(data[:12])
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+def detect_system_players():
+    """Find the command-line audio players once.
+    
+    Returns a list of (argv without the file, set of formats it plays), best first.
+    """
+    if sys.platform == "darwin":
+        candidates = [(["afplay"], {"wav", "mp3", "flac"})]
+    elif os.name == "nt":
+        candidates = [(["powershell", "-NoProfile", "-Command",
+                        "(New-Object Media.SoundPlayer $args[0]).PlaySync()"], {"wav"})]
+    else:
+        candidates = [(["aplay", "-q"], {"wav"}),
+                      (["paplay"], {"wav", "ogg", "flac"}),
+                      (["ffplay", "-nodisp", "-autoexit", "-loglevel", "error"], {"wav", "ogg", "flac", "mp3"})]
+    players = []
+    for argv, formats in candidates:
+        path = shutil.which(argv[0])
+        if path:
+            players.append(([path] + argv[1:], formats))
+    return players
+
+# Private directory for clips handed to an external player, created on first use
+_audio_temp_dir = None
+
+def _private_audio_dir():
+    """Create (once) a directory only this user can read, on tmpfs when there is one."""
+    global _audio_temp_dir
+    if _audio_temp_dir is None or not os.path.isdir(_audio_temp_dir):
+        # /dev/shm is memory-backed on Linux; elsewhere use the system temp directory
+        base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+        _audio_temp_dir = tempfile.mkdtemp(prefix="train-station-audio-", dir=base)
+        atexit.register(shutil.rmtree, _audio_temp_dir, True)
+    return _audio_temp_dir
+
+@contextmanager
+def private_audio_file(audio_bytes, suffix=".wav"):
+    """Write a clip to a private temporary file for an external player and remove it afterwards."""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=_private_audio_dir())
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio_bytes)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# Pieces of text ending in sentence punctuation (English or Japanese), with trailing space.
+# English punctuation only ends a sentence before whitespace, so "$25.50" and "3.5" stay whole
+SENTENCE_PATTERN = re.compile(r'.+?(?:[.!?]+(?=\s|\Z)|[。！？]+|\Z)\s*', re.S)
+# Pieces of a sentence ending in clause punctuation, used to split very long sentences
+CLAUSE_PATTERN = re.compile(r'[^,;:、，]+[,;:、，]*\s*|[,;:、，]+\s*')
+
+def split_into_sentences(text, max_chars=160, min_chars=12):
+    """Split text into sentences for speech, breaking long sentences at clauses.
+    
+    Pieces shorter than min_chars are merged into the next one, so a quick "Woof!"
+    doesn't become a request of its own.
+    """
+    pieces = []
+    for sentence in SENTENCE_PATTERN.findall(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        current = ""
+        for clause in CLAUSE_PATTERN.findall(sentence):
+            if current and len(current) + len(clause) > max_chars:
+                pieces.append(current)
+                current = ""
+            current += clause
+        if current:
+            pieces.append(current)
+    
+    # Pieces keep their own trailing space until the end, so merging never adds any
+    merged = []
+    current = ""
+    for piece in pieces:
+        current += piece
+        if len(current.strip()) >= min_chars:
+            merged.append(current)
+            current = ""
+    # A short tail joins the previous piece
+    if current.strip():
+        if merged:
+            merged[-1] += current
+        else:
+            merged.append(current)
+    return [piece.strip() for piece in merged]
+
+class CircuitBreaker:
+    """Tracks the failures of one AI service and stops sending it traffic while it is down.
+    
+    closed: requests flow normally. open: requests are refused until reset_timeout has
+    passed or a health probe succeeds. half_open: trial requests go through; a success
+    closes the breaker again and a failure re-opens it.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name, failure_threshold=3, reset_timeout=15.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        # Services count as down until the first health probe says otherwise
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self.consecutive_failures = 0
+        self.health_checked_at = 0
+        
+        # Statistics
+        self.requests = 0
+        self.failures = 0
+        self.open_count = 0
+        self.total_open_time = 0.0
+        
+        self._lock = threading.Lock()
+    
+    def _set_state(self, state):
+        # Caller holds the lock
+        if state == self.state:
+            return
+        now = time.time()
+        if self.state == self.OPEN:
+            self.total_open_time += now - self.opened_at
+        if state == self.OPEN:
+            self.opened_at = now
+            self.open_count += 1
+        debug_log(f"Circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+    
+    @property
+    def is_open(self):
+        """Whether requests are currently refused. Unlike allow_request(), never changes the state."""
+        return self.state == self.OPEN and time.time() - self.opened_at < self.reset_timeout
+    
+    def allow_request(self):
+        """Whether a request may be sent now. Moves open to half-open once reset_timeout passes."""
+        with self._lock:
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            return self.state != self.OPEN
+    
+    def record_success(self):
+        """A request succeeded."""
+        with self._lock:
+            self.requests += 1
+            self.consecutive_failures = 0
+            self._set_state(self.CLOSED)
+    
+    def record_failure(self):
+        """A request failed. Opens the breaker after failure_threshold failures in a row,
+        or straight away if it was half-open."""
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"{self.name} service failing, pausing requests to it")
+                self._set_state(self.OPEN)
+                # Restart the timeout so the service gets a rest before the next trial
+                self.opened_at = time.time()
+    
+    def record_health(self, available, checked_at):
+        """Apply a health probe result. Results older than the last one applied are ignored."""
+        with self._lock:
+            if checked_at <= self.health_checked_at:
+                return
+            self.health_checked_at = checked_at
+            if not available:
+                self._set_state(self.OPEN)
+                self.opened_at = checked_at
+            elif self.state == self.OPEN:
+                # Healthy again: let real traffic confirm it before fully closing
+                self.consecutive_failures = 0
+                self._set_state(self.HALF_OPEN)
+    
+    def force(self, available):
+        """Set the breaker closed or open directly."""
+        with self._lock:
+            self.consecutive_failures = 0
+            self._set_state(self.CLOSED if available else self.OPEN)
+    
+    def stats(self):
+        """Current state, failure rate and time spent open."""
+        with self._lock:
+            now = time.time()
+            open_for = now - self.opened_at if self.state == self.OPEN else 0.0
+            return {
+                "state": self.state,
+                "requests": self.requests,
+                "failures": self.failures,
+                "failure_rate": self.failures / self.requests if self.requests else 0.0,
+                "open_count": self.open_count,
+                "open_for": open_for,
+                "total_open_time": self.total_open_time + open_for,
+            }
+
+class ServiceSession:
+    """Keep-alive HTTP session for one AI service, with a bounded connection pool and retries."""
+    
+    def __init__(self, name, pool_size=4, retries=2, backoff_factor=0.2):
+        self.name = name
+        self.requests = 0
+        
+        # Connection failures are retried for every method, since nothing was sent yet.
+        # Bad gateway style responses are only retried for GETs.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+    
+    def get(self, url, **kwargs):
+        self.requests += 1
+        return self.session.get(url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        self.requests += 1
+        return self.session.post(url, **kwargs)
+    
+    def stats(self):
+        """Requests sent, TCP connections opened and how many requests reused a connection."""
+        pools = self.adapter.poolmanager.pools
+        opened = 0
+        pooled_requests = 0
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            opened += pool.num_connections
+            pooled_requests += pool.num_requests
+        return {
+            "requests": self.requests,
+            "connections_opened": opened,
+            "connections_reused": max(0, pooled_requests - opened),
+        }
+    
+    def close(self):
+        self.session.close()
+
+class TTSCache:
+    """Byte-bounded LRU cache of synthesized speech, keyed by (text, voice, language)."""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return cached audio for key, or None."""
+        with self._lock:
+            audio_data = self._entries.get(key)
+            if audio_data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio_data
+    
+    def size_of(self, value):
+        """Bytes an entry counts against max_bytes."""
+        return len(value)
+    
+    def put(self, key, audio_data):
+        """Store audio for key, evicting the least recently used entries to stay under max_bytes."""
+        size = self.size_of(audio_data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= self.size_of(self._entries.pop(key))
+            self._entries[key] = audio_data
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= self.size_of(evicted)
+                self.evictions += 1
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+    
+    def stats(self):
+        """Entry count, size in bytes, hit rate and evictions."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+class SoundCache(TTSCache):
+    """LRU cache of decoded pygame Sounds, keyed by a hash of the audio bytes and bounded by PCM size."""
+    
+    @staticmethod
+    def key_for(audio_data):
+        return hashlib.blake2b(audio_data, digest_size=16).digest()
+    
+    def size_of(self, sound):
+        frequency, size, channels = pygame.mixer.get_init() or (44100, -16, 2)
+        return int(sound.get_length() * frequency) * channels * (abs(size) // 8)
+
+def parse_wav_header(data):
+    """Parse the start of a WAV file.
+    
+    Returns (format, data_offset, data_size) once the header is complete, or None if more
+    bytes are needed. format is a dict of rate, channels, sample_width and is_float.
+    Raises ValueError if the data isn't a PCM or float WAV.
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a WAV file")
+    pos = 12
+    fmt = None
+    while True:
+        if len(data) < pos + 8:
+            return None
+        chunk_id = bytes(data[pos:pos + 4])
+        chunk_size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data before format chunk")
+            return fmt, pos + 8, chunk_size
+        if len(data) < pos + 8 + chunk_size:
+            return None
+        if chunk_id == b"fmt ":
+            tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", data[pos + 8:pos + 24])
+            if tag == 0xFFFE:  # WAVE_FORMAT_EXTENSIBLE: the real tag starts the sub-format GUID
+                tag = struct.unpack("<H", data[pos + 32:pos + 34])[0]
+            if tag not in (1, 3) or bits not in (8, 16, 32):
+                raise ValueError(f"unsupported WAV encoding (tag {tag}, {bits} bits)")
+            fmt = {"rate": rate, "channels": channels, "sample_width": bits // 8, "is_float": tag == 3}
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+def make_wav(pcm, rate, channels, size):
+    """Wrap raw PCM in a WAV header. size is a pygame sample size (-16 or 32 for float)."""
+    sample_width = abs(size) // 8
+    tag = 3 if size == 32 else 1
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(pcm), b"WAVE", b"fmt ", 16, tag,
+                         channels, rate, rate * channels * sample_width, channels * sample_width,
+                         sample_width * 8, b"data", len(pcm))
+    return header + bytes(pcm)
+
+class PCMConverter:
+    """Convert PCM audio to the mixer's format in blocks, keeping resampling continuous across them."""
+    
+    # Mixer sample sizes we can produce: pygame size -> numpy dtype
+    OUTPUT_TYPES = {-16: "<i2", 32: "<f4"}
+    
+    def __init__(self, rate, channels, sample_width, is_float=False, mixer_format=None):
+        mixer_format = mixer_format or pygame.mixer.get_init()
+        self.out_rate, self.out_size, self.out_channels = mixer_format
+        if self.out_size not in self.OUTPUT_TYPES:
+            raise ValueError(f"unsupported mixer sample size {self.out_size}")
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.is_float = is_float
+        self.frame_bytes = channels * sample_width
+        self._remainder = b""
+        self._last = None   # last input frame of the previous block, for interpolation
+        self._position = 0.0  # next output position, in input frames from the carried frame
+    
+    def _to_float(self, raw):
+        """Decode raw little-endian samples to float32 frames scaled like 16-bit audio."""
+        if self.is_float:
+            samples = np.frombuffer(raw, dtype="<f4") * 32767.0
+        elif self.sample_width == 1:
+            samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) * 256.0
+        elif self.sample_width == 2:
+            samples = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+        else:
+            samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 65536.0
+        return samples.reshape(-1, self.channels)
+    
+    def _remix(self, frames):
+        if self.channels == self.out_channels:
+            return frames
+        if self.out_channels == 1:
+            return frames.mean(axis=1, keepdims=True)
+        if self.channels == 1:
+            return np.repeat(frames, self.out_channels, axis=1)
+        if self.channels < self.out_channels:
+            # Repeat the source channels within each frame (stereo -> L R L R ...)
+            return frames[:, np.arange(self.out_channels) % self.channels]
+        return frames[:, :self.out_channels]
+    
+    def _resample(self, frames):
+        if self.rate == self.out_rate:
+            return frames
+        if self._last is not None:
+            frames = np.concatenate([self._last, frames])
+        step = self.rate / self.out_rate
+        positions = np.arange(self._position, len(frames) - 1, step)
+        self._position += len(positions) * step - (len(frames) - 1)
+        self._last = frames[-1:]
+        index = positions.astype(np.int64)
+        fraction = (positions - index)[:, None].astype(np.float32)
+        return frames[index] * (1.0 - fraction) + frames[index + 1] * fraction
+    
+    def convert(self, raw):
+        """Convert a block of raw PCM bytes. Partial frames are kept for the next block."""
+        raw = self._remainder + bytes(raw)
+        usable = len(raw) - len(raw) % self.frame_bytes
+        self._remainder = raw[usable:]
+        if not usable:
+            return b""
+        frames = self._resample(self._remix(self._to_float(raw[:usable])))
+        if self.out_size == 32:
+            return (frames / 32767.0).astype("<f4").tobytes()
+        return np.clip(frames, -32768, 32767).astype("<i2").tobytes()
+
+class StreamingClip:
+    """A TTS clip played while it downloads: PCM blocks are handed to the mixer as they arrive."""
+    
+    def __init__(self, response, on_complete=None, first_block_seconds=0.1, block_seconds=0.4):
+        self.response = response
+        self.on_complete = on_complete  # called with the whole body once it has been read
+        self.first_block_seconds = first_block_seconds
+        self.block_seconds = block_seconds
+        self.body = bytearray()
+        self._closed = False
+    
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.response.close()
+    
+    def _chunks(self, chunk_size=16 * 1024):
+        try:
+            for chunk in self.response.iter_content(chunk_size):
+                self.body += chunk
+                yield chunk
+            # A download closed from another thread can end quietly; never cache half a clip
+            if self.on_complete is not None and self.is_complete():
+                self.on_complete(self.body)
+        finally:
+            self.close()
+    
+    def is_complete(self):
+        """Whether the whole body has arrived: by Content-Length, else by the WAV data size."""
+        if self._closed:
+            return False
+        length = self.response.headers.get("Content-Length")
+        encoding = self.response.headers.get("Content-Encoding", "identity").lower()
+        if length and encoding == "identity":
+            return len(self.body) == int(length)
+        try:
+            header = parse_wav_header(self.body)
+        except ValueError:
+            header = None
+        if header is not None:
+            _, data_offset, data_size = header
+            if 0 < data_size < 0xFFFFFFFF:
+                return len(self.body) >= data_offset + data_size
+        return True
+    
+    def read_all(self):
+        """Read the rest of the body and return all of it."""
+        for _ in self._chunks():
+            pass
+        return self.body
+    
+    def sounds(self, decode):
+        """Yield pygame Sounds for consecutive blocks of the clip as they download.
+        
+        Anything other than PCM WAV, or a mixer format we can't produce, is downloaded
+        completely and decoded as one Sound.
+        """
+        chunks = self._chunks()
+        header = None
+        try:
+            for chunk in chunks:
+                header = parse_wav_header(self.body)
+                if header is not None:
+                    break
+            if header is None:
+                raise ValueError("incomplete WAV header")
+            fmt, data_offset, data_size = header
+            converter = PCMConverter(fmt["rate"], fmt["channels"], fmt["sample_width"], fmt["is_float"])
+        except ValueError as e:
+            debug_log(f"Not streaming TTS audio ({e}), decoding it whole")
+            for _ in chunks:
+                pass
+            yield decode(self.body)
+            return
+        
+        # Servers streaming a WAV often don't know its size and write 0 or 0xFFFFFFFF
+        data_end = data_offset + data_size if 0 < data_size < 0xFFFFFFFF else None
+        bytes_per_second = fmt["rate"] * fmt["channels"] * fmt["sample_width"]
+        block_bytes = int(bytes_per_second * self.first_block_seconds)
+        read_to = data_offset
+        
+        def next_block(final=False):
+            nonlocal read_to
+            end = len(self.body) if data_end is None else min(len(self.body), data_end)
+            if end - read_to < block_bytes and not final:
+                return None
+            pcm = converter.convert(self.body[read_to:end])
+            read_to = end
+            return pygame.mixer.Sound(buffer=pcm) if pcm else None
+        
+        sound = next_block()
+        if sound is not None:
+            yield sound
+        for chunk in chunks:
+            sound = next_block()
+            if sound is not None:
+                block_bytes = int(bytes_per_second * self.block_seconds)
+                yield sound
+        sound = next_block(final=True)
+        if sound is not None:
+            yield sound
+
+# Posted by the audio engine's channel when a clip finishes. The game loop passes these to
+# AudioEngine.handle_event so the engine wakes exactly at the end of a clip.
+AUDIO_END_EVENT = pygame.USEREVENT + 1
+
+class AudioJob:
+    """A queued piece of playback: clips (bytes, or futures resolving to bytes) played in order."""
+    
+    def __init__(self, clips, priority):
+        self.clips = list(clips)
+        self.priority = priority
+        self.cancelled = False
+        self.played = False
+        self.done = threading.Event()
+    
+    def cancel(self):
+        self.cancelled = True
+        # Clips that haven't started synthesizing are no longer needed, and open
+        # downloads are closed once their request has finished
+        for clip in self.clips:
+            if hasattr(clip, "cancel"):
+                clip.cancel()
+                clip.add_done_callback(close_streaming_clip)
+            elif isinstance(clip, StreamingClip):
+                clip.close()
+
+def close_streaming_clip(future):
+    """Done-callback that closes the download of a cancelled streaming clip."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    clip = future.result()
+    if isinstance(clip, StreamingClip):
+        clip.close()
+
+class AudioEngine:
+    """Plays all speech on one thread and one reserved mixer channel, from a bounded priority queue.
+    
+    Jobs with a lower priority number play first; jobs of equal priority play in the order they
+    were submitted. The thread sleeps until a clip ends, a clip finishes synthesizing or a job
+    is cancelled, so it costs nothing while idle.
+    """
+    
+    PRIORITY_REPLY = 0
+    PRIORITY_DEFAULT = 1
+    
+    def __init__(self, decode, fallback=None, max_queue=8):
+        self.decode = decode      # audio bytes -> pygame Sound
+        self.fallback = fallback  # audio bytes -> bool, used when the mixer can't play
+        self.max_queue = max_queue
+        self.played = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self._queue = []  # heap of (priority, sequence, job)
+        self._sequence = itertools.count()
+        self._current = None
+        self._channel = None
+        self._idle_at = 0.0       # when the channel will have played everything given to it
+        self._slot_free_at = 0.0  # when the channel's queue slot frees up
+        self._cond = threading.Condition()
+        self._thread = None
+    
+    @property
+    def busy(self):
+        """True while a job is playing or waiting to play."""
+        with self._cond:
+            return self._current is not None or bool(self._queue)
+    
+    def submit(self, clips, priority=PRIORITY_DEFAULT, interrupt=False):
+        """Queue clips for playback and return the job. interrupt=True cancels everything else first.
+        
+        When the queue is full the least urgent job, which may be this one, is dropped.
+        """
+        job = AudioJob(clips, priority)
+        with self._cond:
+            if interrupt:
+                self._cancel_all()
+            entry = (priority, next(self._sequence), job)
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue)
+                if entry > worst:
+                    self._drop(job)
+                    return job
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self._drop(worst[2])
+            heapq.heappush(self._queue, entry)
+            self._cond.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audio-engine")
+                self._thread.daemon = True
+                self._thread.start()
+        return job
+    
+    def skip(self):
+        """Stop the job that is playing now and move on to the next one."""
+        with self._cond:
+            if self._current is not None:
+                self._cancel(self._current)
+            self._cond.notify_all()
+    
+    def stop(self):
+        """Stop the job that is playing and drop everything queued."""
+        with self._cond:
+            self._cancel_all()
+            self._cond.notify_all()
+    
+    def handle_event(self, event):
+        """Wake the engine on the end-of-clip event. Returns True if the event was the engine's."""
+        if event.type != AUDIO_END_EVENT:
+            return False
+        with self._cond:
+            self._cond.notify_all()
+        return True
+    
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "playing": self._current is not None,
+                "played": self.played,
+                "dropped": self.dropped,
+                "cancelled": self.cancelled,
+            }
+    
+    def _drop(self, job):
+        job.cancel()
+        job.done.set()
+        self.dropped += 1
+    
+    def _cancel(self, job):
+        job.cancel()
+        self.cancelled += 1
+        if self._channel is not None:
+            self._channel.stop()
+    
+    def _cancel_all(self):
+        if self._current is not None:
+            self._cancel(self._current)
+        for _, _, job in self._queue:
+            job.cancel()
+            job.done.set()
+            self.cancelled += 1
+        self._queue = []
+    
+    def _wait_until(self, job, ready, deadline=None):
+        """Sleep until ready() or the job is cancelled.
+        
+        deadline is when ready() is expected. Without end events (no game loop forwarding
+        them) nothing wakes the engine, so it stops waiting once the deadline plus the
+        mixer's latency has passed, whether or not ready() has come true.
+        """
+        with self._cond:
+            while not job.cancelled and not ready():
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline + self._latency() - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return not job.cancelled
+    
+    @staticmethod
+    def _latency():
+        """How far the channel can lag behind the clip lengths: one mixer buffer."""
+        settings = mixer_settings()
+        latency_ms = settings["latency_ms"] if settings and settings["latency_ms"] else 50
+        return latency_ms / 1000
+    
+    def _notify(self, *_):
+        with self._cond:
+            self._cond.notify_all()
+    
+    def _get_channel(self):
+        """The reserved channel all speech plays on, or None if the mixer is unavailable."""
+        if self._channel is None:
+            if not pygame.mixer.get_init():
+                init_audio()
+            if not pygame.mixer.get_init():
+                return None
+            pygame.mixer.set_reserved(1)
+            self._channel = pygame.mixer.Channel(0)
+            self._channel.set_endevent(AUDIO_END_EVENT)
+        return self._channel
+    
+    def _enqueue(self, job, channel, sound):
+        """Play a sound on the channel, queued behind the one playing so there is no gap."""
+        if not self._wait_until(job, lambda: channel.get_queue() is None or not channel.get_busy(),
+                                self._slot_free_at):
+            return False
+        length = sound.get_length()
+        now = time.monotonic()
+        with self._cond:
+            queued = channel.get_queue()
+            if queued is not None and channel.get_busy():
+                # Running later than the clip lengths say; queueing now would replace the
+                # queued sound, so wait for the end event (or that sound's length) first
+                self._cond.wait(queued.get_length())
+            if job.cancelled:
+                return False
+            if channel.get_busy():
+                channel.queue(sound)
+                self._slot_free_at = self._idle_at
+                self._idle_at += length
+            else:
+                channel.play(sound)
+                self._slot_free_at = now
+                self._idle_at = now + length
+        return True
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._queue)
+                self._current = job
+            try:
+                self._play_job(job)
+            except Exception as e:
+                # Cancelling a job closes its downloads, which can interrupt a read
+                if job.cancelled:
+                    debug_log(f"Playback ended by cancel: {e}")
+                else:
+                    print(f"Error playing TTS audio: {e}")
+                    traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._current = None
+                    job.done.set()
+    
+    def _play_job(self, job):
+        channel = None
+        for clip in job.clips:
+            # Sentences still being synthesized wake the engine when they finish
+            if hasattr(clip, "result"):
+                clip.add_done_callback(self._notify)
+                if not self._wait_until(job, clip.done):
+                    return
+                try:
+                    clip = clip.result()
+                except Exception as e:
+                    debug_log(f"Sentence synthesis failed: {e}")
+                    continue
+            if job.cancelled:
+                return
+            if not clip:
+                continue
+            
+            channel = self._get_channel()
+            if channel is None:
+                if isinstance(clip, StreamingClip):
+                    clip = clip.read_all()
+                if self.fallback is not None and self.fallback(clip):
+                    job.played = True
+                continue
+            
+            sounds = clip.sounds(self.decode) if isinstance(clip, StreamingClip) else [self.decode(clip)]
+            for sound in sounds:
+                if not self._enqueue(job, channel, sound):
+                    return
+            job.played = True
+            self.played += 1
+        
+        # Let the last clip finish before starting the next job
+        if channel is not None:
+            self._wait_until(job, lambda: not channel.get_busy(), self._idle_at)
+
+def trim_silence(samples, rate, threshold, keep_seconds=0.15, window_seconds=0.01):
+    """Find the speech in a recording. Returns (start, end) sample indices.
+    
+    Windows quieter than threshold (RMS) at either end are cut, keeping keep_seconds of margin.
+    Returns (0, 0) if nothing in the recording reaches the threshold.
+    """
+    window = max(1, int(rate * window_seconds))
+    count = len(samples) // window
+    if not count:
+        return 0, len(samples)
+    frames = samples[:count * window].astype(np.float32).reshape(count, window)
+    loud = np.flatnonzero(np.sqrt(np.mean(frames * frames, axis=1)) >= threshold)
+    if not len(loud):
+        return 0, 0
+    margin = int(rate * keep_seconds)
+    return max(0, loud[0] * window - margin), min(len(samples), (loud[-1] + 1) * window + margin)
+
+class MicrophoneStream:
+    """One capture stream kept open for the session, writing 16-bit mono audio into a ring buffer.
+    
+    PortAudio's callback copies each block into a preallocated NumPy array, so capturing allocates
+    nothing per chunk. Positions are absolute sample counts; anything within the last
+    buffer_seconds can be read back, which is what gives recordings their pre-roll.
+    """
+    
+    def __init__(self, rate, chunk, buffer_seconds=30):
+        self.rate = rate
+        self.chunk = chunk
+        self.ring = np.zeros(int(rate * buffer_seconds), dtype=np.int16)
+        self.position = 0  # samples written since the stream opened
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()  # open() is called from the game's workers and the recorder
+        self._audio = None
+        self._stream = None
+    
+    @property
+    def is_open(self):
+        return self._stream is not None
+    
+    def open(self):
+        """Open the input device and start capturing. Safe to call when already open."""
+        with self._lock:
+            if self._stream is not None:
+                return True
+            try:
+                self._audio = pyaudio.PyAudio()
+                self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.rate,
+                                                input=True, frames_per_buffer=self.chunk,
+                                                stream_callback=self._callback)
+                self._stream.start_stream()
+                return True
+            except Exception as e:
+                print(f"Could not open the microphone: {e}")
+                self._close()
+                return False
+    
+    def close(self):
+        with self._lock:
+            self._close()
+    
+    def _close(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+    
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.write(np.frombuffer(in_data, dtype="<i2"))
+        return None, pyaudio.paContinue
+    
+    def write(self, samples):
+        """Append samples to the ring, wrapping around at the end."""
+        size = len(self.ring)
+        total = len(samples)
+        # Only the newest ring's worth is kept, but positions still count every sample
+        samples = samples[-size:]
+        start = (self.position + total - len(samples)) % size
+        first = min(len(samples), size - start)
+        self.ring[start:start + first] = samples[:first]
+        self.ring[:len(samples) - first] = samples[first:]
+        with self._cond:
+            self.position += total
+            self._cond.notify_all()
+    
+    def oldest(self):
+        """Earliest position still held in the ring."""
+        return max(0, self.position - len(self.ring))
+    
+    def read(self, start, count, timeout=1.0):
+        """Wait until count samples from start are captured and return them.
+        
+        The result is a view into the ring unless it wraps around. Returns None on timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.position >= start + count, timeout):
+                return None
+        return self.samples(start, start + count)
+    
+    def samples(self, start, end):
+        """Samples between two positions (clamped to what the ring still holds)."""
+        size = len(self.ring)
+        start = max(start, self.position - size)
+        count = end - start
+        if count <= 0:
+            return self.ring[:0]
+        first = start % size
+        if first + count <= size:
+            return self.ring[first:first + count]
+        return np.concatenate([self.ring[first:], self.ring[:first + count - size]])
+
+class ASRStream:
+    """Upload audio to the streaming transcription endpoint while it is being recorded.
+    
+    PCM chunks go out as a chunked request body on one thread; the service's newline-delimited
+    JSON replies ({"partial": ...} while listening, {"text": ...} at the end) are read on another,
+    so partial hypotheses arrive while the player is still talking.
+    """
+    
+    def __init__(self, url, rate, channels=1, on_partial=None, timeout=10):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        self.rate = rate
+        self.channels = channels
+        self.on_partial = on_partial
+        self.timeout = timeout
+        self.partial = ""
+        self.text = None
+        self.status = None  # HTTP status of the reply, once it arrives
+        self.error = None
+        self.done = threading.Event()
+        self._chunks = queue.Queue()
+        self._connected = threading.Event()
+        self._connection = None
+    
+    def start(self):
+        sender = threading.Thread(target=self._send, name="asr-upload")
+        sender.daemon = True
+        sender.start()
+        return self
+    
+    def feed(self, pcm):
+        """Queue a chunk of recorded 16-bit PCM for upload."""
+        self._chunks.put(bytes(pcm))
+    
+    def finish(self):
+        """End the upload; the service then sends its final transcript."""
+        self._chunks.put(None)
+    
+    def cancel(self):
+        self.finish()
+        if self._connection is not None:
+            self._connection.close()
+    
+    def result(self, timeout=5.0):
+        """Wait for the final transcript. Returns None if the stream failed or timed out."""
+        self.done.wait(timeout)
+        return self.text
+    
+    def _send(self):
+        try:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            # Once the reply is read the connection is closed; never reopen it for a stray chunk
+            self._connection.connect()
+            self._connection.auto_open = 0
+            self._connection.putrequest("POST", self.path)
+            self._connection.putheader("Content-Type",
+                                       f"audio/l16; rate={self.rate}; channels={self.channels}")
+            self._connection.putheader("Transfer-Encoding", "chunked")
+            self._connection.putheader("Accept", "application/x-ndjson")
+            self._connection.endheaders()
+        except Exception as e:
+            self._fail(e)
+            return
+        
+        # The reply is read while the body is still going out
+        reader = threading.Thread(target=self._read, name="asr-results")
+        reader.daemon = True
+        reader.start()
+        
+        try:
+            while True:
+                chunk = self._chunks.get()
+                if self.done.is_set():
+                    # The service has already answered (or failed); the rest of the body is moot
+                    break
+                if chunk is None:
+                    self._connection.send(b"0\r\n\r\n")
+                    break
+                if chunk:
+                    self._connection.send(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        except Exception as e:
+            # The service may have answered early (e.g. 404) and closed its end
+            if not self.done.is_set():
+                debug_log(f"ASR upload stopped: {e}")
+    
+    def _read(self):
+        try:
+            response = self._connection.getresponse()
+            self.status = response.status
+            if response.status != 200:
+                self.error = f"HTTP {response.status}"
+                return
+            for line in response:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(b"data:"):
+                    line = line[5:].strip()
+                event = json.loads(line)
+                if "partial" in event or event.get("final") is False:
+                    self.partial = event.get("partial", event.get("text", ""))
+                    if self.on_partial is not None:
+                        self.on_partial(self.partial)
+                elif "text" in event:
+                    self.text = event["text"]
+                    break
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.done.set()
+            self._chunks.put(None)
+            self._connection.close()
+    
+    def _fail(self, error):
+        self.error = str(error)
+        self.done.set()
+
+class VoiceActivityDetector:
+    """Energy-based voice activity detection with an adaptive noise floor and end-of-speech timeout.
+    
+    Feed it 16-bit mono chunks with process(). The noise floor follows the room while the player
+    is quiet, and the silence needed to end an utterance follows the pauses the player makes
+    mid-sentence: quick talkers get a short timeout, slow ones a longer one.
+    """
+    
+    SILENCE = "silence"
+    SPEECH = "speech"
+    END = "end"
+    
+    def __init__(self, rate, min_energy=300.0, speech_ratio=3.0, min_end_silence=0.35,
+                 max_end_silence=1.2, no_speech_timeout=5.0):
+        self.rate = rate
+        self.min_energy = min_energy          # RMS below this never counts as speech
+        self.speech_ratio = speech_ratio      # speech starts this far above the noise floor
+        self.min_end_silence = min_end_silence
+        self.max_end_silence = max_end_silence
+        self.no_speech_timeout = no_speech_timeout
+        self.noise_floor = None
+        self.pauses = deque(maxlen=20)        # seconds of mid-utterance pauses, across utterances
+        self.reset()
+    
+    def reset(self):
+        """Start listening for a new utterance. The noise floor and pause history carry over."""
+        self.in_speech = False
+        self.heard_speech = False
+        self.silence = 0.0
+        self.elapsed = 0.0
+        self.speech_seconds = 0.0
+    
+    @property
+    def end_silence(self):
+        """Seconds of silence that end the utterance, from the player's recent pauses."""
+        if not self.pauses:
+            return 0.7
+        return min(self.max_end_silence, max(self.min_end_silence, 1.5 * float(np.percentile(self.pauses, 90))))
+    
+    @property
+    def threshold(self):
+        """RMS energy that counts as speech right now."""
+        return max(self.min_energy, (self.noise_floor or 0.0) * self.speech_ratio)
+    
+    @staticmethod
+    def as_samples(chunk):
+        """16-bit samples from raw bytes or an int16 array."""
+        if isinstance(chunk, np.ndarray):
+            return chunk
+        return np.frombuffer(chunk, dtype="<i2")
+    
+    @staticmethod
+    def energy(chunk):
+        """RMS energy of a chunk of 16-bit samples."""
+        samples = VoiceActivityDetector.as_samples(chunk).astype(np.float32)
+        if not len(samples):
+            return 0.0
+        return float(np.sqrt(np.mean(samples * samples)))
+    
+    def process(self, chunk):
+        """Classify the next chunk (bytes or int16 array). Returns SILENCE, SPEECH or END."""
+        duration = len(self.as_samples(chunk)) / self.rate
+        energy = self.energy(chunk)
+        self.elapsed += duration
+        
+        # Hysteresis: speech continues down to two thirds of the threshold that starts it
+        threshold = self.threshold * (2 / 3 if self.in_speech else 1.0)
+        if energy >= threshold:
+            if self.heard_speech and not self.in_speech and self.silence > 0:
+                self.pauses.append(self.silence)
+            self.in_speech = True
+            self.heard_speech = True
+            self.silence = 0.0
+            self.speech_seconds += duration
+            return self.SPEECH
+        
+        self.in_speech = False
+        # Only quiet chunks teach the noise floor, so speech never raises it
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        else:
+            self.noise_floor += 0.05 * (energy - self.noise_floor)
+        
+        if not self.heard_speech:
+            return self.END if self.elapsed >= self.no_speech_timeout else self.SILENCE
+        self.silence += duration
+        return self.END if self.silence >= self.end_silence else self.SILENCE
+
 class AIServiceClient:
     """Client for interacting with ASR, NPC-AI, and TTS services."""
     
     # Class attribute for PyAudio availability
     PYAUDIO_AVAILABLE = PYAUDIO_AVAILABLE
     
-    def __init__(self):
+    # Seconds a health check result is considered fresh
+    HEALTH_CACHE_TTL = 30.0
+    HEALTH_CHECK_TIMEOUT = 1
+    
+    # Last known health of each service URL, shared by every client in the process:
+    # health URL -> (available, time checked)
+    _health_cache = {}
+    _health_lock = threading.Lock()
+    _health_done = threading.Condition(_health_lock)
+    _health_refreshing = set()
+    
+    # Seconds between background health probes of services whose breaker is not closed
+    HEALTH_MONITOR_INTERVAL = 5.0
+    
+    # Stream NPC-AI replies token by token (NPC_AI_STREAMING=1) instead of waiting for the whole reply
+    NPC_AI_STREAMING = os.environ.get('NPC_AI_STREAMING', '0') == '1'
+    
+    # Memory budget for synthesized speech kept in the TTS cache
+    TTS_CACHE_BYTES = int(float(os.environ.get('TTS_CACHE_MB', '32')) * 1024 * 1024)
+    
+    # Memory budget for decoded Sounds, counted as PCM bytes at the mixer's format
+    SOUND_CACHE_BYTES = int(float(os.environ.get('SOUND_CACHE_MB', '48')) * 1024 * 1024)
+    
+    # Audio from just before recording starts that is kept, so the first syllable isn't lost
+    PREROLL_SECONDS = 0.3
+    
+    # Upload voice input while it is recorded and show partial transcripts (ASR_STREAMING=1)
+    ASR_STREAMING = os.environ.get('ASR_STREAMING', '0') == '1'
+    
+    # Send voice input as FLAC (with soundfile) or gzip'd WAV (ASR_COMPACT_UPLOAD=1)
+    ASR_COMPACT_UPLOAD = os.environ.get('ASR_COMPACT_UPLOAD', '0') == '1'
+    
+    # Ask the TTS service for raw audio bodies (TTS_BINARY_AUDIO=0 to always use JSON)
+    TTS_BINARY_AUDIO = os.environ.get('TTS_BINARY_AUDIO', '1') != '0'
+    TTS_BINARY_ACCEPT = "audio/ogg, audio/wav;q=0.9, application/json;q=0.5"
+    
+    # Play audio_url clips while they download (TTS_STREAM_AUDIO=0 to download them first)
+    TTS_STREAM_AUDIO = os.environ.get('TTS_STREAM_AUDIO', '1') != '0'
+    
+    # How many sentences of a reply are synthesized at the same time
+    TTS_CONCURRENCY = 2
+    
+    # Connection pool size and retry count for each service's HTTP session
+    HTTP_POOL_SIZE = int(os.environ.get('AI_HTTP_POOL_SIZE', '4'))
+    HTTP_RETRIES = int(os.environ.get('AI_HTTP_RETRIES', '2'))
+    
+    def __init__(self, check_on_startup=True, pool_size=None, retries=None):
         # Service URLs
         self.asr_url = "http://localhost:8000"
         self.npc_ai_url = "http://localhost:8002"
         self.tts_url = "http://localhost:8001"
         
-        # Service availability flags
-        self.asr_available = False
-        self.npc_ai_available = False
-        self.tts_available = False
+        # One pooled keep-alive session per service
+        pool_size = pool_size or self.HTTP_POOL_SIZE
+        retries = self.HTTP_RETRIES if retries is None else retries
+        self.sessions = {
+            "asr": ServiceSession("ASR", pool_size, retries),
+            "npc_ai": ServiceSession("NPC-AI", pool_size, retries),
+            "tts": ServiceSession("TTS", pool_size, retries),
+        }
+        
+        # Service availability is tracked by one circuit breaker per service
+        self.breakers = {
+            "asr": CircuitBreaker("ASR"),
+            "npc_ai": CircuitBreaker("NPC-AI"),
+            "tts": CircuitBreaker("TTS"),
+        }
+        self._monitor_stop = threading.Event()
+        self._monitor_thread = None
+        self._health_applied = threading.Condition()  # notified whenever probe results reach the breakers
         
-        # Check services on startup
-        self.check_services()
+        # Take the last known service status and refresh it in the background
+        if check_on_startup:
+            self.check_services(wait=False)
+            self.start_health_monitor()
         
         # Voice recording settings - only set if PyAudio is available
         if PYAUDIO_AVAILABLE:
-            self.format = pyaudio.paInt16
             self.channels = 1
             self.rate = 16000
-            self.chunk = 1024
-            self.threshold = 500  # Audio threshold to detect voice
-            self.silence_threshold = 30  # Frames of silence before stopping
+            self.chunk = 512  # 32 ms per chunk, so the end of speech is caught promptly
+            self.vad = VoiceActivityDetector(self.rate)
+        
+        # Capture stream kept open once voice input has been used (see open_microphone)
+        self.microphone = None
+        self._microphone_lock = threading.Lock()
         
-        # Recording state
+        # Recording state. Each recording gets a new id; a recording whose id is no longer
+        # current has been cancelled and must leave the state of the next one alone
         self.is_recording = False
         self.recording_thread = None
+        self.recording_id = 0
+        self._recording_lock = threading.Lock()
+        self.hold_recording = False  # push-to-talk: record until released, not until silence
+        self._stop_position = None
+        
+        # Streaming transcription of the current recording, switched off for the session
+        # if the ASR service doesn't offer it
+        self.stream_asr = self.ASR_STREAMING
+        self._asr_stream = None
+        
+        # Compact voice uploads, switched off for the session if the ASR service refuses them
+        self.compact_asr_upload = self.ASR_COMPACT_UPLOAD
+        self._recording_stats = None  # size and trimmed silence of the last recording
         self.audio_data = None
         
-        # Audio playback state
-        self.is_playing_audio = False
+        # Command-line players used when the mixer can't play, found once up front
+        self.system_players = detect_system_players()
+        self._player_process = None
+        self._killed_process = None  # the player process stop_audio() killed, if any
+        
+        # All playback goes through one engine thread
+        self.audio_engine = AudioEngine(self._load_sound, fallback=self._play_with_system_player)
+        
+        # Sentences of a reply are synthesized on this pool and played in order as they finish
+        self._tts_pool = ThreadPoolExecutor(max_workers=self.TTS_CONCURRENCY, thread_name_prefix="tts")
         
         # NPC voice mapping
         self.npc_voices = {
@@ -125,160 +1464,603 @@ class AIServiceClient:
         # Conversation history
         self.conversation_history = {}
         
+        # Synthesized speech, so repeated lines play without a round trip to TTS
+        self.tts_cache = TTSCache(self.TTS_CACHE_BYTES)
+        self.sound_cache = SoundCache(self.SOUND_CACHE_BYTES)
+        
+        # Player-initiated requests in flight; background warm-up waits while this is non-zero
+        self._foreground_requests = 0
+        self._foreground_idle = threading.Condition()
+        self._warmup_thread = None
+        
+        # Streaming chat mode, switched off for the session if the service doesn't support it
+        self.stream_npc_responses = self.NPC_AI_STREAMING
+        
+        # Binary TTS responses, switched off for the session if the service refuses them
+        self.tts_binary_audio = self.TTS_BINARY_AUDIO
+        self.stream_tts_audio = self.TTS_STREAM_AUDIO
+        
+        # Latency metrics in milliseconds, most recent last
+        self.metrics = {
+            "npc_ttft_ms": deque(maxlen=100),
+            "npc_total_ms": deque(maxlen=100),
+            "tts_convert_ms": deque(maxlen=100),
+            "asr_final_ms": deque(maxlen=100),
+            "asr_upload_bytes": deque(maxlen=100),
+            "asr_saved_bytes": deque(maxlen=100),
+            "asr_trimmed_ms": deque(maxlen=100),
+        }
+        
+        # Sample format of the TTS service's WAV output, detected from the first clip
+        self.tts_format = None
+        
         # Initialize pygame mixer if not already initialized
-        if not pygame.mixer.get_init():
-            pygame.mixer.init(frequency=44100)
+        init_audio()
     
-    def check_services(self):
-        """Check if the AI services are available."""
-        try:
-            # Check ASR service
-            response = requests.get(f"{self.asr_url}/health", timeout=1)
-            self.asr_available = response.status_code == 200
-        except:
-            self.asr_available = False
-            
+    # Availability flags, backed by the circuit breakers. Reading them doesn't change a
+    # breaker's state; code about to send a request calls allow_request() instead
+    @property
+    def asr_available(self):
+        return not self.breakers["asr"].is_open
+    
+    @asr_available.setter
+    def asr_available(self, value):
+        self.breakers["asr"].force(value)
+    
+    @property
+    def npc_ai_available(self):
+        return not self.breakers["npc_ai"].is_open
+    
+    @npc_ai_available.setter
+    def npc_ai_available(self, value):
+        self.breakers["npc_ai"].force(value)
+    
+    @property
+    def tts_available(self):
+        return not self.breakers["tts"].is_open
+    
+    @tts_available.setter
+    def tts_available(self, value):
+        self.breakers["tts"].force(value)
+    
+    def service_stats(self):
+        """Circuit breaker state, failure rate and open durations for each service."""
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+    
+    def connection_stats(self):
+        """Requests, connections opened and connections reused for each service's session."""
+        return {name: session.stats() for name, session in self.sessions.items()}
+    
+    def metrics_summary(self):
+        """Last and average value of each metric (times in milliseconds, sizes in bytes)."""
+        return {name: {"last": values[-1], "avg": sum(values) / len(values), "count": len(values)}
+                for name, values in self.metrics.items() if values}
+    
+    def _health_urls(self):
+        """Health endpoint for each service."""
+        return {
+            "asr": f"{self.asr_url}/health",
+            "npc_ai": f"{self.npc_ai_url}/api/v1/health",  # NPC-AI uses a versioned path
+            "tts": f"{self.tts_url}/health",
+        }
+    
+    def _probe_health(self, url):
+        """Send one health check GET and return whether the service answered 200."""
+        service = {health_url: name for name, health_url in self._health_urls().items()}.get(url)
         try:
-            # Check NPC-AI service - use the correct endpoint path
-            response = requests.get(f"{self.npc_ai_url}/api/v1/health", timeout=1)
-            self.npc_ai_available = response.status_code == 200
+            if service:
+                response = self.sessions[service].get(url, timeout=self.HEALTH_CHECK_TIMEOUT)
+            else:
+                response = requests.get(url, timeout=self.HEALTH_CHECK_TIMEOUT)
+            return response.status_code == 200
         except:
-            self.npc_ai_available = False
-            
+            return False
+    
+    def _probe_services(self, urls):
+        """Probe the given health URLs concurrently and record the results in the shared cache."""
         try:
-            # Check TTS service
-            response = requests.get(f"{self.tts_url}/health", timeout=1)
-            self.tts_available = response.status_code == 200
-        except:
-            self.tts_available = False
-            
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                results = dict(zip(urls, executor.map(self._probe_health, urls)))
+            now = time.time()
+            with self._health_lock:
+                for url, available in results.items():
+                    self._health_cache[url] = (available, now)
+        finally:
+            with self._health_lock:
+                self._health_refreshing.difference_update(urls)
+                self._health_done.notify_all()
+    
+    def _apply_health(self):
+        """Feed the cached health results into the circuit breakers."""
+        with self._health_lock:
+            results = {name: self._health_cache.get(url, (False, 0))
+                       for name, url in self._health_urls().items()}
+        for name, (available, checked_at) in results.items():
+            if checked_at:
+                self.breakers[name].record_health(available, checked_at)
+        with self._health_applied:
+            self._health_applied.notify_all()
+    
+    def _report_services(self):
         print(f"Services: ASR {'✓' if self.asr_available else '✗'}, NPC-AI {'✓' if self.npc_ai_available else '✗'}, TTS {'✓' if self.tts_available else '✗'}")
+    
+    def _refresh_in_background(self, urls):
+        """Probe the services off-thread, then update the flags."""
+        self._probe_services(urls)
+        self._apply_health()
+        self._report_services()
+    
+    def check_services(self, wait=True, max_age=None):
+        """Check if the AI services are available.
+        
+        Results younger than max_age (default HEALTH_CACHE_TTL) are reused. With wait=False
+        the last known status is returned immediately and stale entries are refreshed in
+        the background.
+        """
+        if max_age is None:
+            max_age = self.HEALTH_CACHE_TTL
+        
+        now = time.time()
+        urls = list(self._health_urls().values())
+        with self._health_lock:
+            stale = [url for url in urls
+                     if now - self._health_cache.get(url, (False, 0))[1] > max_age
+                     and url not in self._health_refreshing]
+            self._health_refreshing.update(stale)
+        
+        if wait:
+            if stale:
+                self._probe_services(stale)
+            # Also wait for probes another caller already has in flight
+            with self._health_done:
+                self._health_done.wait_for(lambda: not self._health_refreshing.intersection(urls),
+                                           timeout=self.HEALTH_CHECK_TIMEOUT * 2)
+            self._apply_health()
+            if stale:
+                self._report_services()
+        elif stale:
+            thread = threading.Thread(target=self._refresh_in_background, args=(stale,),
+                                      name="service-health")
+            thread.daemon = True
+            thread.start()
+            self._apply_health()
+        else:
+            self._apply_health()
+        
         return self.asr_available and self.npc_ai_available and self.tts_available
     
-    def start_recording(self):
-        """Start recording audio from microphone in a separate thread."""
+    def start_health_monitor(self, interval=None):
+        """Start a background thread that re-probes services whose breaker is open,
+        so traffic comes back on its own once a service recovers."""
+        if self._monitor_thread and self._monitor_thread.is_alive():
+            return
+        self._monitor_stop.clear()
+        self._monitor_thread = threading.Thread(
+            target=self._monitor_health,
+            args=(interval or self.HEALTH_MONITOR_INTERVAL,),
+            name="health-monitor"
+        )
+        self._monitor_thread.daemon = True
+        self._monitor_thread.start()
+    
+    def stop_health_monitor(self):
+        """Stop the background health monitor."""
+        self._monitor_stop.set()
+    
+    def _monitor_health(self, interval):
+        while not self._monitor_stop.wait(interval):
+            try:
+                # Services that are down get probed every interval, healthy ones once per TTL
+                urls = self._health_urls()
+                down = [urls[name] for name, breaker in self.breakers.items()
+                        if breaker.state != CircuitBreaker.CLOSED]
+                with self._health_lock:
+                    down = [url for url in down if url not in self._health_refreshing]
+                    self._health_refreshing.update(down)
+                if down:
+                    self._probe_services(down)
+                    self._apply_health()
+                self.check_services(wait=True)
+            except Exception as e:
+                debug_log(f"Health monitor error: {e}")
+    
+    def start_recording(self, on_partial=None, hold=False):
+        """Start recording audio from microphone in a separate thread.
+        
+        In streaming mode the audio is transcribed as it is recorded, and on_partial is called
+        (from a background thread) with each partial transcript. With hold=True (push-to-talk)
+        the end of speech doesn't stop the recording; it runs until stop_recording() or, after
+        release_recording(), until the player goes quiet.
+        """
         if not PYAUDIO_AVAILABLE:
             print("PyAudio is not available. Cannot record audio.")
             return False
             
         if self.is_recording:
             return False
-            
-        self.is_recording = True
-        self.recording_thread = threading.Thread(target=self._record_audio)
-        self.recording_thread.daemon = True
-        self.recording_thread.start()
+        
+        asr_stream = None
+        if self.stream_asr and self.breakers["asr"].allow_request():
+            asr_stream = ASRStream(f"{self.asr_url}/transcribe/stream", self.rate,
+                                   self.channels, on_partial).start()
+        with self._recording_lock:
+            self.recording_id += 1
+            self.is_recording = True
+            self.hold_recording = hold
+            self._stop_position = None
+            self.audio_data = None
+            self._recording_stats = None
+            self._asr_stream = asr_stream
+            self.recording_thread = threading.Thread(target=self._record_audio, args=(self.recording_id,))
+            self.recording_thread.daemon = True
+            self.recording_thread.start()
         return True
     
-    def stop_recording(self):
-        """Stop the ongoing recording and return the audio data."""
+    def stop_recording(self, recording_id=None):
+        """Stop the ongoing recording and return the audio data.
+        
+        With a recording_id, only that recording is stopped; None is returned if it was cancelled.
+        """
         if not PYAUDIO_AVAILABLE:
             return None
-            
-        if not self.is_recording:
-            return None
-            
-        self.is_recording = False
-        if self.recording_thread:
-            self.recording_thread.join(timeout=1.0)
+        
+        with self._recording_lock:
+            if recording_id is not None and recording_id != self.recording_id:
+                return None
+            thread, self.recording_thread = self.recording_thread, None
+            if thread is None:
+                return None
+            # The recording may already have ended by itself at the end of speech; if not,
+            # it keeps everything captured up to this moment
+            if self.is_recording and self.microphone is not None:
+                self._stop_position = self.microphone.position
+            self.is_recording = False
+        thread.join(timeout=1.0)
         
         return self.audio_data
     
-    def _record_audio(self):
+    def release_recording(self):
+        """Let a push-to-talk recording end by itself at the end of speech."""
+        self.hold_recording = False
+    
+    def cancel_recording(self, recording_id=None):
+        """Throw the recording (and any streamed transcription) away, without waiting for it.
+        
+        With a recording_id, a recording that has since been replaced is left alone.
+        """
+        with self._recording_lock:
+            if recording_id is not None and recording_id != self.recording_id:
+                return
+            # The recording thread sees its id is gone and stops by itself
+            self.recording_id += 1
+            self.is_recording = False
+            self.recording_thread = None
+            self.audio_data = None
+            asr_stream, self._asr_stream = self._asr_stream, None
+        if asr_stream is not None:
+            asr_stream.cancel()
+    
+    def open_microphone(self):
+        """Open the session's capture stream ahead of time, so recordings start instantly."""
+        if not PYAUDIO_AVAILABLE:
+            return False
+        with self._microphone_lock:
+            if self.microphone is None:
+                self.microphone = MicrophoneStream(self.rate, self.chunk)
+        return self.microphone.open()
+    
+    def close_microphone(self):
+        if self.microphone is not None:
+            self.microphone.close()
+    
+    def _record_audio(self, recording_id):
         """Record audio from microphone until silence is detected."""
         if not PYAUDIO_AVAILABLE:
             return
-            
-        p = pyaudio.PyAudio()
-        stream = p.open(format=self.format, channels=self.channels,
-                        rate=self.rate, input=True,
-                        frames_per_buffer=self.chunk)
+        if not self.open_microphone():
+            with self._recording_lock:
+                if recording_id == self.recording_id:
+                    self.is_recording = False
+            return
+        mic = self.microphone
+        
+        # Start a little in the past so the first syllable isn't clipped
+        start = max(mic.oldest(), mic.position - int(self.rate * self.PREROLL_SECONDS))
+        position = start
         
         print("Recording started...")
         
-        frames = []
-        silent_frames = 0
+        self.vad.reset()
+        asr_stream = self._asr_stream
         
-        while self.is_recording:
-            data = stream.read(self.chunk)
-            frames.append(data)
-            
-            # Check for silence
-            audio_data = array('h', data)
-            volume = max(abs(x) for x in audio_data)
+        while self.is_recording and recording_id == self.recording_id:
+            chunk = mic.read(position, self.chunk)
+            if chunk is None:
+                print("Microphone stopped delivering audio")
+                break
+            if recording_id != self.recording_id:
+                break
+            position += len(chunk)
+            if asr_stream is not None:
+                asr_stream.feed(chunk)
             
-            if volume < self.threshold:
-                silent_frames += 1
-                if silent_frames > self.silence_threshold:
-                    break
-            else:
-                silent_frames = 0
+            # Stop once the player has finished speaking (or never started)
+            if self.vad.process(chunk) == VoiceActivityDetector.END and not self.hold_recording:
+                break
+        with self._recording_lock:
+            if recording_id != self.recording_id:
+                # Cancelled: the audio is thrown away along with its streamed transcription
+                print("Recording cancelled")
+                return
+            self.is_recording = False
         
-        print("Recording stopped.")
+        # Take in the audio captured between the last chunk and the stop request
+        stop_position = self._stop_position
+        if stop_position is not None and stop_position > position:
+            tail = mic.samples(position, stop_position)
+            if asr_stream is not None and len(tail):
+                asr_stream.feed(tail)
+            position = stop_position
+        if asr_stream is not None:
+            asr_stream.finish()
         
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+        print(f"Recording stopped ({self.vad.speech_seconds:.1f} s of speech, "
+              f"end-of-speech timeout {self.vad.end_silence:.2f} s)")
+        
+        # Keep only the speech, trimming the quiet lead-in and the end-of-speech wait
+        samples = mic.samples(start, position)
+        first, last = trim_silence(samples, self.rate, self.vad.threshold)
+        stats = {
+            "raw_bytes": len(samples) * 2 + 44,
+            "trimmed_ms": (len(samples) - (last - first)) * 1000 / self.rate,
+        }
         
         # Save the recorded audio as WAV
-        if frames:
-            self.audio_data = self._save_to_wav(frames)
+        audio_data = self._save_to_wav(samples[first:last]) if last > first else None
+        with self._recording_lock:
+            if recording_id == self.recording_id:
+                self._recording_stats = stats
+                self.audio_data = audio_data
     
-    def _save_to_wav(self, frames):
-        """Convert raw audio frames to WAV format."""
-        if not PYAUDIO_AVAILABLE:
-            return None
-            
-        audio_data = io.BytesIO()
-        wf = wave.open(audio_data, 'wb')
-        wf.setnchannels(self.channels)
-        wf.setsampwidth(pyaudio.PyAudio().get_sample_size(self.format))
-        wf.setframerate(self.rate)
-        wf.writeframes(b''.join(frames))
-        wf.close()
+    def _save_to_wav(self, samples):
+        """Convert recorded 16-bit samples to WAV format."""
+        return io.BytesIO(make_wav(samples.astype("<i2", copy=False).tobytes(), self.rate, self.channels, -16))
+    
+    def transcribe_recording(self, audio_data, recording_id=None):
+        """Transcript of the last recording: the streamed one if there is one, else a regular upload.
         
-        audio_data.seek(0)
-        return audio_data
+        With a recording_id, a recording cancelled in the meantime isn't transcribed at all.
+        """
+        with self._recording_lock:
+            if recording_id is not None and recording_id != self.recording_id:
+                return ""
+            asr_stream, self._asr_stream = self._asr_stream, None
+        if asr_stream is not None:
+            start_time = time.time()
+            text = asr_stream.result(timeout=5)
+            if text is not None:
+                self.breakers["asr"].record_success()
+                self.metrics["asr_final_ms"].append((time.time() - start_time) * 1000)
+                return text
+            asr_stream.cancel()
+            if asr_stream.status in (404, 405, 501):
+                print("ASR service has no streaming endpoint, using regular transcription")
+                self.stream_asr = False
+            else:
+                debug_log(f"Streaming transcription failed ({asr_stream.error}), uploading the recording")
+        if not audio_data:
+            return ""
+        return self.speech_to_text(audio_data)
+    
+    def _encode_upload(self, wav_bytes):
+        """Compact lossless encoding of a WAV upload. Returns (filename, body, content type)."""
+        if soundfile is not None:
+            fmt, data_offset, data_size = parse_wav_header(wav_bytes)
+            samples = np.frombuffer(wav_bytes, dtype="<i2", count=data_size // 2, offset=data_offset)
+            encoded = io.BytesIO()
+            soundfile.write(encoded, samples, fmt["rate"], format="FLAC", subtype="PCM_16")
+            return "audio.flac", encoded.getvalue(), "audio/flac"
+        return "audio.wav.gz", gzip.compress(wav_bytes, 6), "application/gzip"
     
     def speech_to_text(self, audio_data):
         """Convert audio to text using ASR service."""
-        if not self.asr_available:
+        if not self.breakers["asr"].allow_request():
             print("ASR service is not available")
             return ""
             
         try:
-            files = {'audio': ('audio.wav', audio_data, 'audio/wav')}
-            response = requests.post(f"{self.asr_url}/transcribe", files=files, timeout=5)
+            wav_bytes = bytes(audio_bytes_of(audio_data))
+            upload = ("audio.wav", wav_bytes, "audio/wav")
+            encode_ms = 0.0
+            if self.compact_asr_upload:
+                start_time = time.perf_counter()
+                upload = self._encode_upload(wav_bytes)
+                encode_ms = (time.perf_counter() - start_time) * 1000
+            
+            response = self.sessions["asr"].post(f"{self.asr_url}/transcribe", files={'audio': upload}, timeout=5)
+            if response.status_code == 415 and self.compact_asr_upload:
+                print("ASR service doesn't accept compact uploads, sending WAV")
+                self.compact_asr_upload = False
+                upload = ("audio.wav", wav_bytes, "audio/wav")
+                encode_ms = 0.0
+                response = self.sessions["asr"].post(f"{self.asr_url}/transcribe", files={'audio': upload}, timeout=5)
+            self._report_upload(upload, encode_ms)
             response.raise_for_status()
             result = response.json()
+            self.breakers["asr"].record_success()
             return result.get('text', '')
         except Exception as e:
             print(f"ASR service error: {e}")
-            self.asr_available = False  # Mark as unavailable after an error
+            self.breakers["asr"].record_failure()
             return ""
     
+    def _report_upload(self, upload, encode_ms):
+        """Print and record how much a voice upload saved by trimming and encoding."""
+        stats, self._recording_stats = self._recording_stats, None
+        sent = len(upload[1])
+        raw_bytes = stats["raw_bytes"] if stats else sent
+        trimmed_ms = stats["trimmed_ms"] if stats else 0.0
+        self.metrics["asr_upload_bytes"].append(sent)
+        self.metrics["asr_saved_bytes"].append(raw_bytes - sent)
+        self.metrics["asr_trimmed_ms"].append(trimmed_ms)
+        print(f"ASR upload: {sent / 1024:.1f} KB as {upload[0]}, saved {(raw_bytes - sent) / 1024:.1f} KB "
+              f"and {trimmed_ms:.0f} ms of silence (encoding took {encode_ms:.1f} ms)")
+    
+    def _npc_request(self, npc_name, player_text):
+        """Map an NPC name to its NPC-AI ID and build the chat payload. Returns (npc_id, payload)."""
+        # Map our NPC names to the NPC-AI service's expected IDs
+        npc_id_mapping = {
+            "Hachiko": "companion_dog",
+            "Information": "information_booth_attendant",
+            "Ticket": "ticket_booth_attendant",
+            "Station Platform Attendant 1": "station_attendant_kyoto",
+            "Station Platform Attendant 2": "station_attendant_odawara",
+            "Station Platform Attendant 3": "station_attendant_osaka"
+        }
+        
+        # Get the correct NPC ID for the service
+        npc_id = npc_id_mapping.get(npc_name, npc_name)
+        print(f"Mapped NPC '{npc_name}' to NPC-AI ID: '{npc_id}'")
+        
+        # Generate a session ID based on the NPC name
+        session_id = f"{npc_id}_{hash(npc_name)}"[:20]
+        
+        # Prepare payload for NPC-AI service with correct field names according to docs
+        payload = {
+            "npc_id": npc_id,
+            "player_id": "player1",
+            "message": player_text,
+            "session_id": session_id
+        }
+        return npc_id, payload
+    
+    @staticmethod
+    def _stream_token(data):
+        """Extract the text of one streamed event, which may be JSON or plain text."""
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return data
+        if isinstance(event, str):
+            return event
+        if isinstance(event, dict):
+            for key in ('token', 'delta', 'text', 'content', 'response_text', 'response'):
+                if isinstance(event.get(key), str):
+                    return event[key]
+        return ""
+    
+    def _iter_stream_tokens(self, response):
+        """Yield text chunks from a streaming chat response (server-sent events, NDJSON or plain text)."""
+        content_type = response.headers.get('Content-Type', '')
+        if 'text/event-stream' in content_type or 'ndjson' in content_type:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                if 'text/event-stream' in content_type:
+                    if not line.startswith('data:'):
+                        continue  # event names, ids and comments
+                    line = line[len('data:'):].strip()
+                if line == '[DONE]':
+                    break
+                token = self._stream_token(line)
+                if token:
+                    yield token
+        else:
+            response.encoding = response.encoding or 'utf-8'
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+    
+    def get_npc_response_stream(self, npc_name, player_text, on_token):
+        """Get an AI response from NPC-AI, passing each text chunk to on_token as it arrives.
+        
+        Uses the streaming chat endpoint and records time-to-first-token. Falls back to
+        get_npc_response (delivering the reply as a single chunk) if the service can't stream.
+        Returns the full response, like get_npc_response.
+        """
+        if not self.breakers["npc_ai"].allow_request():
+            print("NPC-AI service is not available")
+            return None
+        
+        if not self.stream_npc_responses:
+            npc_response = self.get_npc_response(npc_name, player_text)
+            if npc_response:
+                on_token(npc_response)
+            return npc_response
+        
+        try:
+            npc_id, payload = self._npc_request(npc_name, player_text)
+            payload["stream"] = True
+            
+            print(f"Streaming from NPC-AI for '{npc_name}' (ID: {npc_id}): {player_text}")
+            start_time = time.perf_counter()
+            response = self.sessions["npc_ai"].post(
+                f"{self.npc_ai_url}/api/v1/chat/stream",
+                json=payload,
+                headers={"Accept": "text/event-stream, application/x-ndjson, text/plain"},
+                stream=True,
+                timeout=10
+            )
+            
+            if response.status_code in (404, 405, 501):
+                # The service has no streaming endpoint - stop trying for this session
+                response.close()
+                print("NPC-AI streaming not supported, using regular chat")
+                self.stream_npc_responses = False
+                return self.get_npc_response_stream(npc_name, player_text, on_token)
+            
+            if response.status_code != 200:
+                print(f"NPC-AI service error: {response.status_code} {response.reason}")
+                response.close()
+                if response.status_code >= 500:
+                    self.breakers["npc_ai"].record_failure()
+                return None
+            
+            parts = []
+            with response, self._foreground_request():
+                for token in self._iter_stream_tokens(response):
+                    if not parts:
+                        ttft_ms = (time.perf_counter() - start_time) * 1000
+                        self.metrics["npc_ttft_ms"].append(ttft_ms)
+                        print(f"NPC-AI time to first token: {ttft_ms:.0f} ms")
+                    parts.append(token)
+                    on_token(token)
+            self.metrics["npc_total_ms"].append((time.perf_counter() - start_time) * 1000)
+            self.breakers["npc_ai"].record_success()
+            
+            npc_response = "".join(parts).strip()
+            if not npc_response:
+                print(f"Unexpected response format")
+                return None
+            print(f"Raw AI response: {npc_response}")
+            
+            # Check if response is in Japanese and romanize if needed
+            if contains_japanese(npc_response):
+                print(f"Japanese response detected: {npc_response}")
+                npc_response = romanize_japanese(npc_response)
+            
+            # Add both sides of the exchange to history (just for our local tracking)
+            history = self.conversation_history.setdefault(npc_name, [])
+            history.append({"role": "user", "content": player_text})
+            history.append({"role": "assistant", "content": npc_response})
+            
+            return npc_response
+        except Exception as e:
+            print(f"NPC-AI service error: {e}")
+            traceback.print_exc()
+            self.breakers["npc_ai"].record_failure()
+            return None
+    
     def get_npc_response(self, npc_name, player_text):
         """Get AI response from NPC-AI service."""
-        if not self.npc_ai_available:
+        if not self.breakers["npc_ai"].allow_request():
             print("NPC-AI service is not available")
             return None
             
         try:
             print(f"Getting response from NPC named: '{npc_name}'")
             
-            # Map our NPC names to the NPC-AI service's expected IDs
-            npc_id_mapping = {
-                "Hachiko": "companion_dog",
-                "Information": "information_booth_attendant",
-                "Ticket": "ticket_booth_attendant",
-                "Station Platform Attendant 1": "station_attendant_kyoto",
-                "Station Platform Attendant 2": "station_attendant_odawara",
-                "Station Platform Attendant 3": "station_attendant_osaka"
-            }
-            
-            # Get the correct NPC ID for the service
-            npc_id = npc_id_mapping.get(npc_name, npc_name)
-            print(f"Mapped NPC '{npc_name}' to NPC-AI ID: '{npc_id}'")
+            npc_id, payload = self._npc_request(npc_name, player_text)
             
             # Get or initialize conversation history for this NPC
             if npc_name not in self.conversation_history:
@@ -288,26 +2070,24 @@ class AIServiceClient:
             # Add player message to history (just for our local tracking)
             self.conversation_history[npc_name].append({"role": "user", "content": player_text})
             
-            # Generate a session ID based on the NPC name
-            session_id = f"{npc_id}_{hash(npc_name)}"[:20]
-            
-            # Prepare payload for NPC-AI service with correct field names according to docs
-            payload = {
-                "npc_id": npc_id,
-                "player_id": "player1",
-                "message": player_text,
-                "session_id": session_id
-            }
-            
             # Log the full request JSON
             print(f"NPC-AI Request JSON: {json.dumps(payload, ensure_ascii=False, indent=2)}")
             
             print(f"Sending to NPC-AI for '{npc_name}' (ID: {npc_id}): {player_text}")
-            response = requests.post(f"{self.npc_ai_url}/api/v1/chat", json=payload, timeout=10)
+            start_time = time.perf_counter()
+            with self._foreground_request():
+                response = self.sessions["npc_ai"].post(f"{self.npc_ai_url}/api/v1/chat", json=payload, timeout=10)
             
             if response.status_code != 200:
                 print(f"NPC-AI service error: {response.status_code} {response.reason}")
+                if response.status_code >= 500:
+                    self.breakers["npc_ai"].record_failure()
                 return None
+            self.breakers["npc_ai"].record_success()
+            # Without streaming the first token arrives with the whole reply
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            self.metrics["npc_ttft_ms"].append(elapsed_ms)
+            self.metrics["npc_total_ms"].append(elapsed_ms)
             
             # Log the full response JSON
             print(f"NPC-AI Response JSON: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
@@ -351,284 +2131,424 @@ class AIServiceClient:
         except Exception as e:
             print(f"NPC-AI service error: {e}")
             traceback.print_exc()
-            self.npc_ai_available = False  # Mark as unavailable after an error
+            self.breakers["npc_ai"].record_failure()
             return None
     
+    def _tts_request(self, text, speaker_name=""):
+        """Work out what to send to TTS for a line of NPC text. Returns (tts_text, voice, language)."""
+        # Check if there's Japanese original text
+        jp_original = None
+        if "[JP_ORIGINAL:" in text and ":JP_ORIGINAL]" in text:
+            start_idx = text.find("[JP_ORIGINAL:") + len("[JP_ORIGINAL:")
+            end_idx = text.find(":JP_ORIGINAL]")
+            if start_idx > 0 and end_idx > start_idx:
+                jp_original = text[start_idx:end_idx].strip()
+                debug_log(f"Found Japanese original text: {jp_original}")
+        
+        # Determine which voice to use based on the speaker
+        voice = "female1"  # Default voice
+        if speaker_name in self.npc_voices:
+            voice = self.npc_voices[speaker_name]
+            debug_log(f"Using voice {voice} for {speaker_name}")
+        
+        # Use Japanese voice for Japanese text if available
+        if jp_original and contains_japanese(jp_original):
+            voice = "japanese1"
+            debug_log(f"Using Japanese voice for Japanese text")
+            # For Japanese, use the original Japanese text
+            return jp_original, voice, "ja"
+        
+        # For other languages, use the full text
+        return text, voice, "en"
+    
     def text_to_speech(self, text, speaker_name=""):
-        """Convert text to speech using TTS service."""
-        if not self.tts_available:
+        """Convert text to speech using TTS service. Repeated lines come from the TTS cache."""
+        tts_text, voice, language = self._tts_request(text, speaker_name)
+        return self._synthesize_cached(tts_text, voice, language)
+    
+    def _synthesize_cached(self, tts_text, voice, language, stream=False):
+        """Synthesize through the TTS cache, as a player-initiated request.
+        
+        With stream=True, audio served from an audio_url comes back as a StreamingClip,
+        which is added to the cache once it has downloaded.
+        """
+        cache_key = (tts_text, voice, language)
+        audio_data = self.tts_cache.get(cache_key)
+        if audio_data is not None:
+            debug_log(f"TTS cache hit: {tts_text[:50]}...")
+            return audio_data
+        
+        if not self.breakers["tts"].allow_request():
             print("TTS service is not available")
             return None
         
-        debug_log(f"Converting to speech: {text[:50]}...")
+        on_stream_complete = None
+        if stream:
+            on_stream_complete = lambda body: self._cache_clip(cache_key, body)
+        with self._foreground_request():
+            audio_data = self._synthesize(tts_text, voice, language, on_stream_complete)
+        if audio_data and not isinstance(audio_data, StreamingClip):
+            audio_data = self._cache_clip(cache_key, audio_data)
+        return audio_data
+    
+    def _cache_clip(self, cache_key, audio_data):
+        """Convert a synthesized clip to the mixer's format and store it in the TTS cache."""
+        audio_data = self._prepare_clip(audio_data)
+        self.tts_cache.put(cache_key, audio_data)
+        return audio_data
+    
+    def _prepare_clip(self, audio_data):
+        """Resample and remix a WAV clip to the mixer's format, once, so loading it is a plain copy.
+        
+        Clips that already match, aren't PCM WAV, or arrive before the mixer is up pass through.
+        """
+        mixer_format = pygame.mixer.get_init()
+        if not mixer_format:
+            return audio_data
+        try:
+            header = parse_wav_header(audio_data)
+        except ValueError:
+            return audio_data
+        if header is None:
+            return audio_data
+        fmt, data_offset, data_size = header
+        
+        if self.tts_format != fmt:
+            self.tts_format = fmt
+            print(f"TTS audio format: {fmt['rate']} Hz, {fmt['sample_width'] * 8}-bit"
+                  f"{' float' if fmt['is_float'] else ''}, {fmt['channels']} ch")
+        
+        frequency, size, channels = mixer_format
+        matches = (fmt["rate"], fmt["channels"], fmt["sample_width"], fmt["is_float"]) == \
+            (frequency, channels, abs(size) // 8, size == 32)
+        if matches or size not in PCMConverter.OUTPUT_TYPES:
+            return audio_data
+        
+        start_time = time.perf_counter()
+        converter = PCMConverter(fmt["rate"], fmt["channels"], fmt["sample_width"], fmt["is_float"],
+                                 mixer_format)
+        # A size of 0 or 0xFFFFFFFF means unknown (streamed WAV): the data runs to the end
+        data_end = data_offset + data_size if 0 < data_size < 0xFFFFFFFF else len(audio_data)
+        pcm = converter.convert(memoryview(audio_data)[data_offset:data_end])
+        converted = make_wav(pcm, frequency, channels, size)
+        self.metrics["tts_convert_ms"].append((time.perf_counter() - start_time) * 1000)
+        return converted
+    
+    def audio_settings(self):
+        """Mixer settings, the detected TTS output format and the cost of converting clips."""
+        convert_ms = self.metrics["tts_convert_ms"]
+        return {
+            "mixer": mixer_settings(),
+            "tts_format": self.tts_format,
+            "clips_converted": len(convert_ms),
+            "avg_convert_ms": sum(convert_ms) / len(convert_ms) if convert_ms else 0.0,
+        }
+    
+    def report_audio_settings(self):
+        """Print the mixer settings and how TTS audio is being converted for it."""
+        settings = self.audio_settings()
+        mixer = settings["mixer"]
+        if mixer is None:
+            print("Audio: mixer not initialized")
+            return
+        print(f"Audio: mixer {mixer['frequency']} Hz, {abs(mixer['size'])}-bit, {mixer['channels']} ch, "
+              f"buffer {mixer['buffer']} ({mixer['latency_ms'] or 0:.0f} ms)")
+        tts_format = settings["tts_format"]
+        if tts_format is None:
+            print("Audio: TTS format not seen yet")
+        else:
+            print(f"Audio: TTS {tts_format['rate']} Hz, {tts_format['channels']} ch; "
+                  f"{settings['clips_converted']} clips converted, {settings['avg_convert_ms']:.1f} ms each")
+    
+    def _speech_chunks(self, text, speaker_name=""):
+        """Split a line into the (tts_text, voice, language) requests used to speak it."""
+        tts_text, voice, language = self._tts_request(text, speaker_name)
+        return [(sentence, voice, language) for sentence in split_into_sentences(tts_text)]
+    
+    def speak(self, text, speaker_name=""):
+        """Speak a line sentence by sentence, starting as soon as the first sentence is ready.
+        
+        Sentences are synthesized with bounded concurrency and queued for gapless playback
+        in order. Replaces anything that is still playing. Returns immediately. Cached sentences
+        play even while TTS is down; the others are skipped.
+        """
+        chunks = self._speech_chunks(text, speaker_name)
+        futures = [self._tts_pool.submit(self._synthesize_cached, *chunk, stream=True) for chunk in chunks]
+        self.audio_engine.submit(futures, AudioEngine.PRIORITY_REPLY, interrupt=True)
+    
+    @property
+    def is_playing_audio(self):
+        """True while speech is playing or queued."""
+        return self.audio_engine.busy
+    
+    @contextmanager
+    def _foreground_request(self):
+        """Mark a player-initiated request as in flight so background work yields to it."""
+        with self._foreground_idle:
+            self._foreground_requests += 1
+        try:
+            yield
+        finally:
+            with self._foreground_idle:
+                self._foreground_requests -= 1
+                self._foreground_idle.notify_all()
+    
+    def warm_tts_cache(self, lines_by_speaker, wait_for_service=30.0):
+        """Pre-synthesize scripted lines in a low-priority background thread.
+        
+        lines_by_speaker maps an NPC name to its scripted lines; each line is synthesized
+        with that NPC's voice. The job pauses whenever a player-initiated request is in flight.
+        """
+        if self._warmup_thread and self._warmup_thread.is_alive():
+            return
+        self._warmup_thread = threading.Thread(
+            target=self._warm_tts,
+            args=(lines_by_speaker, wait_for_service),
+            name="tts-warmup"
+        )
+        self._warmup_thread.daemon = True
+        self._warmup_thread.start()
+    
+    def _warm_tts(self, lines_by_speaker, wait_for_service):
+        # The startup health probe runs in the background, so give TTS a moment to show up
+        with self._health_applied:
+            if not self._health_applied.wait_for(lambda: self.tts_available, timeout=wait_for_service):
+                debug_log("TTS unavailable, skipping warm-up")
+                return
+        
+        start_time = time.time()
+        synthesized = 0
+        for speaker_name in self.npc_voices:
+            # Warm the same sentence chunks speak() will ask for
+            chunks = [chunk for line in lines_by_speaker.get(speaker_name, [])
+                      for chunk in self._speech_chunks(line, speaker_name)]
+            for tts_text, voice, language in chunks:
+                cache_key = (tts_text, voice, language)
+                if cache_key in self.tts_cache:
+                    continue
+                
+                # Yield to the player: wait until no foreground request is in flight
+                with self._foreground_idle:
+                    self._foreground_idle.wait_for(lambda: self._foreground_requests == 0)
+                if not self.breakers["tts"].allow_request():
+                    return
+                
+                audio_data = self._synthesize(tts_text, voice, language)
+                if audio_data:
+                    self._cache_clip(cache_key, audio_data)
+                    synthesized += 1
+        
+        print(f"Pre-synthesized {synthesized} scripted lines in {time.time() - start_time:.1f} s")
+    
+    def _synthesize(self, tts_text, voice, language, on_stream_complete=None):
+        """Send one synthesis request to the TTS service and return the audio bytes.
+        
+        If on_stream_complete is given and the service answers with an audio_url, returns a
+        StreamingClip that plays while it downloads and passes the whole body to
+        on_stream_complete when done.
+        """
+        debug_log(f"Converting to speech: {tts_text[:50]}...")
         
         try:
-            # Check if there's Japanese original text
-            jp_original = None
-            if "[JP_ORIGINAL:" in text and ":JP_ORIGINAL]" in text:
-                start_idx = text.find("[JP_ORIGINAL:") + len("[JP_ORIGINAL:")
-                end_idx = text.find(":JP_ORIGINAL]")
-                if start_idx > 0 and end_idx > start_idx:
-                    jp_original = text[start_idx:end_idx].strip()
-                    debug_log(f"Found Japanese original text: {jp_original}")
-            
-            # Determine which voice to use based on the speaker
-            voice = "female1"  # Default voice
-            if speaker_name in self.npc_voices:
-                voice = self.npc_voices[speaker_name]
-                debug_log(f"Using voice {voice} for {speaker_name}")
-            
-            # Use Japanese voice for Japanese text if available
-            if jp_original and contains_japanese(jp_original):
-                voice = "japanese1"
-                debug_log(f"Using Japanese voice for Japanese text")
-                # For Japanese, use the original Japanese text
-                tts_text = jp_original
-            else:
-                # For other languages, use the full text
-                tts_text = text
-            
             # Construct the payload
             payload = {
                 "text": tts_text,
                 "voice": voice,
-                "language": "ja" if jp_original and contains_japanese(jp_original) else "en"
+                "language": language
             }
             
             debug_log(f"TTS request: {json.dumps(payload)}")
             
+            # Offer binary audio first; services that don't support it answer with JSON as before
+            binary = self.tts_binary_audio
+            headers = {
+                "Accept": self.TTS_BINARY_ACCEPT if binary else "application/json",
+                "Accept-Encoding": "gzip, deflate",
+            }
+            
             # Make the API request to the synthesis endpoint
-            response = requests.post(
+            response = self.sessions["tts"].post(
                 f"{self.tts_url}/synthesize",
                 json=payload,
+                headers=headers,
+                stream=True,
                 timeout=30  # Increased timeout for longer text
             )
             
-            if response.status_code == 200:
-                synthesis_result = response.json()
-                debug_log("TTS response received")
+            if response.status_code == 406 and binary:
+                debug_log("TTS service refused binary audio, using JSON responses")
+                response.close()
+                self.tts_binary_audio = False
+                return self._synthesize(tts_text, voice, language)
+            
+            # Closing the response hands its connection back to the pool, whatever the outcome
+            with response:
+                content_type = response.headers.get("Content-Type", "")
+                if response.status_code == 200 and content_type.startswith("audio/"):
+                    self.breakers["tts"].record_success()
+                    audio_data = read_audio_body(response)
+                    debug_log(f"Binary TTS response: {content_type}, {len(audio_data)} bytes")
+                    return audio_data
                 
-                if "audio_content" in synthesis_result:
-                    # The audio data is likely base64 encoded
-                    audio_base64 = synthesis_result["audio_content"]
-                    try:
-                        # Decode base64 data to binary
-                        audio_data = base64.b64decode(audio_base64)
-                        debug_log(f"Decoded audio data length: {len(audio_data)} bytes")
-                        return audio_data
-                    except Exception as decode_error:
-                        print(f"Failed to decode audio data: {decode_error}")
-                        debug_log(f"Audio data: {audio_base64[:100]}...")
-                        return None
-                elif "audio_url" in synthesis_result:
-                    # Audio is available at a URL
-                    audio_url = synthesis_result["audio_url"]
-                    debug_log(f"Audio URL from TTS service: {audio_url}")
+                if response.status_code == 200:
+                    self.breakers["tts"].record_success()
+                    synthesis_result = response.json()
+                    debug_log("TTS response received")
                     
-                    # Check if the URL is relative (no scheme) and add the base URL
-                    if audio_url.startswith('/'):
-                        # Get the base URL from self.tts_url
-                        # Extract protocol and host from tts_url (e.g. http://localhost:8001)
-                        tts_url_parts = self.tts_url.split('://')
-                        if len(tts_url_parts) > 1:
-                            scheme = tts_url_parts[0]
-                            host = tts_url_parts[1].split('/')[0]
-                            audio_url = f"{scheme}://{host}{audio_url}"
-                            debug_log(f"Converted relative URL to absolute: {audio_url}")
-                        else:
-                            debug_log(f"Could not parse TTS URL: {self.tts_url}")
+                    if "audio_content" in synthesis_result:
+                        # The audio data is likely base64 encoded
+                        audio_base64 = synthesis_result["audio_content"]
+                        try:
+                            # Decode base64 data to binary
+                            audio_data = base64.b64decode(audio_base64)
+                            debug_log(f"Decoded audio data length: {len(audio_data)} bytes")
+                            return audio_data
+                        except Exception as decode_error:
+                            print(f"Failed to decode audio data: {decode_error}")
+                            debug_log(f"Audio data: {audio_base64[:100]}...")
                             return None
-                    
-                    try:
-                        debug_log(f"Fetching audio from URL: {audio_url}")
-                        audio_response = requests.get(audio_url, timeout=10)
-                        if audio_response.status_code == 200:
-                            debug_log(f"Retrieved audio from URL: {len(audio_response.content)} bytes")
-                            return audio_response.content
-                        else:
-                            print(f"Failed to retrieve audio: {audio_response.status_code}")
-                            debug_log(f"Error response content: {audio_response.text[:100]}")
+                    elif "audio_url" in synthesis_result:
+                        # Audio is available at a URL
+                        audio_url = synthesis_result["audio_url"]
+                        debug_log(f"Audio URL from TTS service: {audio_url}")
+                        
+                        # Check if the URL is relative (no scheme) and add the base URL
+                        if audio_url.startswith('/'):
+                            # Get the base URL from self.tts_url
+                            # Extract protocol and host from tts_url (e.g. http://localhost:8001)
+                            tts_url_parts = self.tts_url.split('://')
+                            if len(tts_url_parts) > 1:
+                                scheme = tts_url_parts[0]
+                                host = tts_url_parts[1].split('/')[0]
+                                audio_url = f"{scheme}://{host}{audio_url}"
+                                debug_log(f"Converted relative URL to absolute: {audio_url}")
+                            else:
+                                debug_log(f"Could not parse TTS URL: {self.tts_url}")
+                                return None
+                        
+                        try:
+                            debug_log(f"Fetching audio from URL: {audio_url}")
+                            streaming = on_stream_complete is not None and self.stream_tts_audio
+                            audio_response = self.sessions["tts"].get(audio_url, timeout=10, stream=streaming)
+                            if audio_response.status_code == 200 and streaming:
+                                return StreamingClip(audio_response, on_complete=on_stream_complete)
+                            if audio_response.status_code == 200:
+                                debug_log(f"Retrieved audio from URL: {len(audio_response.content)} bytes")
+                                return audio_response.content
+                            else:
+                                print(f"Failed to retrieve audio: {audio_response.status_code}")
+                                debug_log(f"Error response content: {audio_response.text[:100]}")
+                                audio_response.close()
+                                return None
+                        except Exception as url_error:
+                            print(f"Error retrieving audio from URL: {url_error}")
                             return None
-                    except Exception as url_error:
-                        print(f"Error retrieving audio from URL: {url_error}")
+                    else:
+                        print(f"Missing required fields in TTS response")
+                        debug_log(f"TTS response: {synthesis_result}")
                         return None
                 else:
-                    print(f"Missing required fields in TTS response")
-                    debug_log(f"TTS response: {synthesis_result}")
+                    print(f"TTS service error: {response.status_code}")
+                    debug_log(f"Error response: {response.text}")
+                    if response.status_code >= 500:
+                        self.breakers["tts"].record_failure()
                     return None
-            else:
-                print(f"TTS service error: {response.status_code}")
-                debug_log(f"Error response: {response.text}")
-                return None
+        except requests.RequestException as e:
+            print(f"TTS service error: {e}")
+            self.breakers["tts"].record_failure()
+            return None
         except Exception as e:
             print(f"Error converting text to speech: {e}")
             traceback.print_exc()
             return None
     
-    def play_audio(self, audio_data):
-        """Play audio from data returned by TTS service."""
+    def play_audio(self, audio_data, wait=True):
+        """Play audio from data returned by TTS service.
+        
+        With wait=True, blocks until the clip has played and returns whether it did.
+        """
         if audio_data is None:
             debug_log("No audio data provided to play")
             return False
             
         debug_log(f"Attempting to play audio... Data type: {type(audio_data)}, Size: {len(audio_data) if isinstance(audio_data, bytes) else 'unknown'}")
         
-        # Set a unique filename for temp files
-        temp_id = str(uuid.uuid4())[:8]
-        temp_file = f"temp_audio_{temp_id}.wav"
-        
         try:
-            # Convert to BytesIO if it's not already
-            if isinstance(audio_data, bytes):
-                debug_log("Converting bytes to BytesIO")
-                audio_buffer = io.BytesIO(audio_data)
-            else:
-                audio_buffer = audio_data
-                
-            # Go back to the start of the buffer
-            audio_buffer.seek(0)
-            
-            # First save to a temporary file - this approach is more reliable
-            debug_log(f"Saving audio to temporary file: {temp_file}")
-            with open(temp_file, "wb") as f:
-                f.write(audio_buffer.read())
-            
-            # Try different playback methods
-            playback_successful = False
-            
-            # Method 1: Play with pygame mixer
-            try:
-                debug_log("Attempting playback with pygame mixer")
-                # Ensure mixer is initialized
-                if not pygame.mixer.get_init():
-                    debug_log("Initializing pygame mixer")
-                    pygame.mixer.init(frequency=44100)
-                
-                # Load sound from file
-                sound = pygame.mixer.Sound(temp_file)
-                debug_log(f"Audio loaded, length: {sound.get_length():.2f} seconds")
-                
-                # Set the playback flag
-                self.is_playing_audio = True
-                
-                # Play the audio
-                channel = sound.play()
-                if channel:
-                    debug_log("Sound playing on channel")
-                    # Wait for it to finish
-                    start_time = time.time()
-                    max_wait = sound.get_length() + 2  # Add a 2-second buffer
-                    
-                    while channel.get_busy() and (time.time() - start_time) < max_wait:
-                        pygame.time.wait(100)
-                    
-                    playback_successful = True
-                    debug_log("Pygame audio playback completed")
-                
-                # Reset the playback flag
-                self.is_playing_audio = False
-                
-            except Exception as e:
-                debug_log(f"Pygame mixer playback failed: {e}")
-                traceback.print_exc()
-                self.is_playing_audio = False
-            
-            # Method 2: System audio player (fallback)
-            if not playback_successful:
-                debug_log("Trying fallback audio playback")
-                try:
-                    if os.name == 'posix':  # macOS, Linux
-                        # Check if we can use afplay (macOS) or aplay (Linux)
-                        if os.system('which afplay > /dev/null 2>&1') == 0:
-                            os.system(f'afplay "{temp_file}"')
-                            debug_log("Used afplay for audio playback")
-                            playback_successful = True
-                        elif os.system('which aplay > /dev/null 2>&1') == 0:
-                            os.system(f'aplay "{temp_file}"')
-                            debug_log("Used aplay for audio playback")
-                            playback_successful = True
-                    elif os.name == 'nt':  # Windows
-                        os.system(f'start /min wmplayer "{temp_file}"')
-                        debug_log("Used Windows Media Player for audio playback")
-                        playback_successful = True
-                except Exception as e:
-                    debug_log(f"System audio player failed: {e}")
-            
-            # Clean up
-            try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                    debug_log(f"Temporary file removed: {temp_file}")
-            except Exception as e:
-                debug_log(f"Failed to remove temporary file: {e}")
-                
-            return playback_successful
+            job = self.audio_engine.submit([audio_bytes_of(audio_data)])
         except Exception as e:
             print(f"Error playing TTS audio: {e}")
             traceback.print_exc()
-            
-            # Try to clean up if possible
-            try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            except:
-                pass
-                
             return False
+        if not wait:
+            return True
+        job.done.wait()
+        return job.played
     
-    def stop_audio(self):
-        """Stop any currently playing audio."""
-        debug_log("Stopping audio playback")
+    def _play_with_system_player(self, audio_bytes):
+        """Fallback for when the pygame mixer can't play: hand the clip to a system player.
         
-        # Stop all channels in pygame mixer
+        The player runs as a child process that stop_audio() can kill.
+        """
+        # Compressed TTS responses need a player that understands them, and a matching suffix
+        audio_format = sniff_audio_format(audio_bytes) or "wav"
+        player = next((argv for argv, formats in self.system_players if audio_format in formats), None)
+        if player is None:
+            debug_log(f"No system audio player for {audio_format} audio")
+            return False
+        debug_log(f"Trying fallback audio playback with {player[0]}")
         try:
-            if pygame.mixer.get_init():
-                pygame.mixer.stop()
-                self.is_playing_audio = False
-                debug_log("Audio playback stopped")
+            with private_audio_file(audio_bytes, suffix=f".{audio_format}") as temp_file:
+                process = subprocess.Popen(player + [temp_file], stdin=subprocess.DEVNULL,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                self._player_process = process
+                try:
+                    _, errors = process.communicate()
+                finally:
+                    self._player_process = None
+            if process.returncode == 0:
                 return True
+            # A player we killed (stop_audio) exits non-zero too, 1 on Windows; that's no error
+            if self._killed_process is not process:
+                print(f"System audio player failed ({process.returncode}): "
+                      f"{errors.decode('utf-8', 'replace').strip()[:200]}")
         except Exception as e:
-            debug_log(f"Failed to stop audio: {e}")
-            
+            print(f"System audio player failed: {e}")
         return False
     
-    def process_voice_input(self, npc_name):
-        """Process voice input through the entire pipeline.
+    def _stop_system_player(self):
+        """Kill the system player if it is playing a clip."""
+        process = self._player_process
+        if process is not None and process.poll() is None:
+            self._killed_process = process
+            process.kill()
+    
+    def _load_sound(self, audio_data):
+        """Decode audio bytes into a pygame Sound without touching the disk.
         
-        Returns a tuple: (text_response, audio_data)
-        where text_response is the NPC's text response and audio_data is the audio to play.
-        This allows the UI to display text immediately while audio is processed separately.
+        Identical audio is decoded once: Sounds are cached by a hash of the bytes, so replays
+        and repeated lines reuse the decoded PCM.
         """
-        # Start recording
-        if not self.start_recording():
-            return None, None
-            
-        # Allow up to 5 seconds of recording
-        for _ in range(50):  # 5 seconds at 0.1 second intervals
-            pygame.time.wait(100)
-            if not self.is_recording:
-                break
-                
-        # Force stop if still recording
-        audio_data = self.stop_recording()
-        
-        if not audio_data:
-            return "I couldn't hear what you said.", None
-            
-        # Convert speech to text
-        text = self.speech_to_text(audio_data)
-        
-        if not text:
-            return "I couldn't hear what you said.", None
-            
-        # Get NPC response
-        response = self.get_npc_response(npc_name, text)
-        
-        if not response:
-            return "Sorry, I couldn't generate a response.", None
-            
-        # Convert response to speech
-        audio = self.text_to_speech(response, npc_name)
-        
-        # Return both text and audio so the UI can handle them separately
-        return response, audio 
\ No newline at end of file
+        audio_data = audio_bytes_of(audio_data)
+        key = SoundCache.key_for(audio_data)
+        sound = self.sound_cache.get(key)
+        if sound is None:
+            sound = pygame.mixer.Sound(file=io.BytesIO(audio_data))
+            self.sound_cache.put(key, sound)
+        return sound
+    
+    def stop_audio(self):
+        """Stop the speech that is playing and drop anything queued after it."""
+        debug_log("Stopping audio playback")
+        try:
+            self.audio_engine.stop()
+            self._stop_system_player()
+            debug_log("Audio playback stopped")
+            return True
+        except Exception as e:
+            debug_log(f"Failed to stop audio: {e}")
+        return False
+    
+    def skip_audio(self):
+        """Skip the line that is playing and go on to the next queued one."""
+        self.audio_engine.skip()
+        self._stop_system_player()
@@ -0,0 +1,96 @@
+import time
+import pygame
+
+class AssetManager:
+    """Loads each image once, converts it to the display format and packs sprites into an atlas."""
+
+    def __init__(self, atlas_width=512, padding=1):
+        self.atlas_width = atlas_width
+        self.padding = padding
+        self.images = {}   # path -> converted surface
+        self.sprites = {}  # path -> subsurface of the sprite atlas
+        self.atlas = None
+        self.stats = {}    # path -> {"load_ms": float, "bytes": int, "size": (w, h)}
+
+    @staticmethod
+    def surface_bytes(surface):
+        """Memory used by a surface's pixel data."""
+        return surface.get_pitch() * surface.get_height()
+
+    def load_image(self, path, alpha=True):
+        """Load an image once and convert it to the display's pixel format."""
+        if path in self.images:
+            return self.images[path]
+
+        start_time = time.perf_counter()
+        surface = pygame.image.load(path)
+        # Conversion needs a display mode; without one the raw surface still works, just slower
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha() if alpha else surface.convert()
+        load_ms = (time.perf_counter() - start_time) * 1000
+
+        self.images[path] = surface
+        self.stats[path] = {
+            "load_ms": load_ms,
+            "bytes": self.surface_bytes(surface),
+            "size": surface.get_size(),
+        }
+        return surface
+
+    def build_atlas(self, paths):
+        """Pack the given sprite images into one atlas surface and cache a subsurface for each."""
+        images = [(path, self.load_image(path)) for path in dict.fromkeys(paths)]
+
+        # Shelf packing: fill rows left to right, tallest sprites first
+        placements = []
+        x = y = shelf_height = 0
+        atlas_width = max([self.atlas_width] + [image.get_width() + self.padding for _, image in images])
+        for path, image in sorted(images, key=lambda item: item[1].get_height(), reverse=True):
+            width, height = image.get_size()
+            if x + width > atlas_width:
+                x = 0
+                y += shelf_height + self.padding
+                shelf_height = 0
+            placements.append((path, image, x, y))
+            x += width + self.padding
+            shelf_height = max(shelf_height, height)
+        atlas_height = max(1, y + shelf_height)
+
+        atlas = pygame.Surface((atlas_width, atlas_height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        atlas.fill((0, 0, 0, 0))
+
+        for path, image, x, y in placements:
+            atlas.blit(image, (x, y))
+            self.sprites[path] = atlas.subsurface(pygame.Rect((x, y), image.get_size()))
+            # The atlas now owns the pixels, so drop the separate copy
+            self.images.pop(path, None)
+
+        self.atlas = atlas
+        self.stats["<sprite atlas>"] = {
+            "load_ms": 0.0,
+            "bytes": self.surface_bytes(atlas),
+            "size": atlas.get_size(),
+        }
+        return atlas
+
+    def sprite(self, path):
+        """Return the atlas subsurface for a sprite, loading it on its own if it isn't packed."""
+        if path in self.sprites:
+            return self.sprites[path]
+        return self.load_image(path)
+
+    def report(self):
+        """Print load time and memory for every asset."""
+        print("Assets loaded:")
+        total_ms = 0.0
+        total_bytes = 0
+        for path, info in self.stats.items():
+            width, height = info["size"]
+            print(f"  {path}: {width}x{height}, {info['load_ms']:.1f} ms, {info['bytes'] / 1024:.0f} KB")
+            total_ms += info["load_ms"]
+            # Packed sprites are counted once, as part of the atlas
+            if path not in self.sprites:
+                total_bytes += info["bytes"]
+        print(f"  total: {total_ms:.1f} ms, {total_bytes / 1024:.0f} KB")
@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import hashlib
+import time
+import threading
+import pygame
+
+# Text used to check that a font can really render Japanese
+JAPANESE_SAMPLE = "こんにちは"
+
+# Fonts known to support Japanese, checked before probing everything else
+PREFERRED_JAPANESE_FONTS = [
+    'msgothic', 'meiryo', 'hiragino kaku gothic pro', 'ms gothic', 'yu gothic',
+    'stsong', 'simsun', 'nsimsun', 'malgungothic', 'microsoftyahei', 'microsoftjhenghei',
+    'yugothic', 'stxihei', 'fzshuti', 'fzyaoti'
+]
+
+# Fonts downloaded into this directory are picked up like system fonts
+LOCAL_FONT_DIR = os.path.join("assets", "fonts")
+
+# Glyph ranges recorded for the resolved font, with a few sample characters each
+GLYPH_RANGES = {
+    "latin": "Aa0",
+    "cjk_punctuation": "。「」",
+    "hiragana": "あこん",
+    "katakana": "アカン",
+    "cjk_unified": "駅切符",
+    "fullwidth": "！？Ａ",
+}
+
+# A code point no real font provides, used to get the "missing glyph" rendering
+MISSING_GLYPH_PROBE = "\U0010FFFD"
+
+# Set FONT_DOWNLOAD=0 on offline machines to never try fetching a font
+FONT_DOWNLOAD_ENABLED = os.environ.get('FONT_DOWNLOAD', '1') != '0'
+FONT_DOWNLOAD_TIMEOUT = 15
+
+# Location of the on-disk font resolution cache
+FONT_CACHE_VERSION = 1
+FONT_CACHE_PATH = os.environ.get(
+    'FONT_CACHE_PATH',
+    os.path.join(os.path.expanduser("~"), ".cache", "train-station-game", "font_cache.json")
+)
+
+def font_directories():
+    """Return the font directories for this platform, including the local bundle."""
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        dirs = [os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+                os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "Fonts")]
+    elif sys.platform == "darwin":
+        dirs = ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    else:
+        dirs = ["/usr/share/fonts", "/usr/local/share/fonts",
+                os.path.join(home, ".fonts"), os.path.join(home, ".local", "share", "fonts")]
+    dirs.append(LOCAL_FONT_DIR)
+    return dirs
+
+def font_directory_signature():
+    """Summarize the mtimes of every font directory so font installs invalidate the cache."""
+    digest = hashlib.sha1()
+    dir_count = 0
+    for root_dir in font_directories():
+        if not os.path.isdir(root_dir):
+            continue
+        # Installing a font touches the directory it lands in, which may be nested
+        for dirpath, dirnames, _ in os.walk(root_dir):
+            dirnames.sort()
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+            digest.update(f"{dirpath}:{mtime}\n".encode("utf-8"))
+            dir_count += 1
+    return f"{dir_count}:{digest.hexdigest()}"
+
+def has_glyph(font, char):
+    """Check whether a font has a real glyph for a character instead of the missing-glyph box."""
+    try:
+        rendered = font.render(char, True, (255, 255, 255), (0, 0, 0))
+        missing = font.render(MISSING_GLYPH_PROBE, True, (255, 255, 255), (0, 0, 0))
+    except Exception:
+        return False
+    if rendered.get_size() != missing.get_size():
+        return True
+    return pygame.image.tobytes(rendered, "RGB") != pygame.image.tobytes(missing, "RGB")
+
+def glyph_coverage(font):
+    """Return which of the GLYPH_RANGES a font covers."""
+    return {name: all(has_glyph(font, char) for char in chars)
+            for name, chars in GLYPH_RANGES.items()}
+
+def supports_japanese(font):
+    """Check that every character of the Japanese sample renders with a real glyph."""
+    return all(has_glyph(font, char) for char in JAPANESE_SAMPLE)
+
+def load_font_cache(path=None):
+    """Load the cached font resolution, or None if it is missing or stale."""
+    path = path or FONT_CACHE_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if record.get("version") != FONT_CACHE_VERSION:
+        return None
+    if record.get("signature") != font_directory_signature():
+        print("Font directories changed since the last launch, probing fonts again")
+        return None
+    if record.get("path") and not os.path.exists(record["path"]):
+        return None
+    return record
+
+def save_font_cache(record, path=None):
+    """Write a font resolution record to the on-disk cache."""
+    path = path or FONT_CACHE_PATH
+    record = dict(record, version=FONT_CACHE_VERSION, signature=font_directory_signature())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write font cache {path}: {e}")
+
+def make_record(name, path, font):
+    """Build a cache record for a resolved font."""
+    coverage = glyph_coverage(font)
+    return {
+        "name": name,
+        "path": path,
+        "japanese": coverage["hiragana"] and coverage["katakana"] and coverage["cjk_unified"],
+        "glyph_ranges": coverage,
+    }
+
+def probe_system_fonts(size):
+    """Walk the installed fonts until one renders Japanese. Returns (font, record) or (None, None)."""
+    available_fonts = pygame.font.get_fonts()
+    preferred = [f for f in PREFERRED_JAPANESE_FONTS if f in available_fonts]
+    others = [f for f in available_fonts if f not in preferred]
+
+    for font_name in preferred + others:
+        path = pygame.font.match_font(font_name)
+        if not path:
+            continue
+        try:
+            test = pygame.font.Font(path, size)
+        except Exception:
+            continue
+        if supports_japanese(test):
+            print(f"Found system font that supports Japanese: {font_name}")
+            return test, make_record(font_name, path, test)
+    return None, None
+
+def probe_local_fonts(size):
+    """Check the fonts bundled in the local font directory. Returns (font, record) or (None, None)."""
+    try:
+        filenames = sorted(os.listdir(LOCAL_FONT_DIR))
+    except OSError:
+        return None, None
+
+    for filename in filenames:
+        if not filename.lower().endswith((".otf", ".ttf", ".ttc")):
+            continue
+        path = os.path.join(LOCAL_FONT_DIR, filename)
+        try:
+            test = pygame.font.Font(path, size)
+        except Exception:
+            continue
+        if supports_japanese(test):
+            print(f"Using bundled Japanese font: {filename}")
+            return test, make_record(filename, path, test)
+    return None, None
+
+def download_japanese_font(size):
+    """Download a Noto CJK font into the local font directory. Returns (font, record) or (None, None)."""
+    import urllib.request
+    import shutil
+
+    urls = [
+        "https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/NotoSansCJKjp-Regular.otf",
+        "https://github.com/googlefonts/noto-cjk/raw/main/Sans/Variable/OTF/NotoSansCJKjp-VF.otf",
+        "https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/Japanese/NotoSansJP-Regular.otf",
+        "https://github.com/googlefonts/google-fonts/raw/main/ofl/notosansjp/NotoSansJP-Regular.ttf"
+    ]
+
+    # Create fonts directory if it doesn't exist
+    os.makedirs(LOCAL_FONT_DIR, exist_ok=True)
+
+    for url in urls:
+        filename = url.split('/')[-1]
+        local_path = os.path.join(LOCAL_FONT_DIR, filename)
+        partial_path = f"{local_path}.part"
+        try:
+            print(f"Downloading Japanese font from {url}...")
+            # Download to a temporary name so an interrupted fetch never looks like a bundled font
+            with urllib.request.urlopen(url, timeout=FONT_DOWNLOAD_TIMEOUT) as response, \
+                    open(partial_path, "wb") as f:
+                shutil.copyfileobj(response, f)
+            os.replace(partial_path, local_path)
+
+            # Try to load the downloaded font and check it can render Japanese
+            font = pygame.font.Font(local_path, size)
+            if not supports_japanese(font):
+                raise ValueError("font has no Japanese glyphs")
+            print(f"Downloaded and loaded Japanese font successfully from {url}")
+            return font, make_record(filename, local_path, font)
+        except Exception as download_error:
+            print(f"Failed to download or use font from {url}: {download_error}")
+            try:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+            except OSError:
+                pass
+            continue
+    return None, None
+
+def fallback_font(size):
+    """Return a font that works everywhere, even if it cannot render Japanese. Returns (font, record)."""
+    path = pygame.font.match_font("monospace")
+    if path:
+        try:
+            font = pygame.font.Font(path, size)
+            print("Using default monospace font - Japanese may not display correctly")
+            return font, make_record("monospace", path, font)
+        except Exception:
+            pass
+
+    # Last resort - use pygame default font
+    font = pygame.font.Font(None, size)
+    print("Using pygame default font - Japanese may not display correctly")
+    return font, make_record("default", None, font)
+
+def load_cached_font(size):
+    """Return the cached Japanese font if the cache is valid, without probing anything."""
+    record = load_font_cache()
+    if record is None or not record["japanese"]:
+        return None
+    try:
+        font = pygame.font.Font(record["path"], size)
+    except Exception as e:
+        print(f"Cached font {record['path']} could not be loaded: {e}")
+        return None
+    print(f"Using cached Japanese-compatible font: {record['name']}")
+    return font
+
+def resolve_japanese_font(size, allow_download=True):
+    """Find a font that supports Japanese: cache, local bundle, system fonts, then download.
+
+    Returns (font, record). Falls back to a font without Japanese glyphs if nothing works.
+    """
+    start_time = time.time()
+
+    record = load_font_cache()
+    font = None
+    if record is not None:
+        try:
+            font = pygame.font.Font(record["path"], size)
+        except Exception as e:
+            print(f"Cached font {record['path']} could not be loaded: {e}")
+            record = None
+
+    if record is None:
+        # Local bundle first, then probe the installed fonts, and remember the answer
+        font, record = probe_local_fonts(size)
+        if font is None:
+            font, record = probe_system_fonts(size)
+        if font is None:
+            font, record = fallback_font(size)
+        save_font_cache(record)
+        print(f"Font probe took {(time.time() - start_time) * 1000:.0f} ms")
+
+    if record["japanese"] or not allow_download:
+        return font, record
+
+    # No local font supports Japanese, so try downloading one
+    downloaded_font, downloaded_record = download_japanese_font(size)
+    if downloaded_font is not None:
+        save_font_cache(downloaded_record)
+        return downloaded_font, downloaded_record
+    return font, record
+
+class BackgroundFontLoader:
+    """Resolve the Japanese font on a background thread while the game uses a provisional font."""
+
+    def __init__(self, size, allow_download=None):
+        self.size = size
+        self.allow_download = FONT_DOWNLOAD_ENABLED if allow_download is None else allow_download
+        self.font = None
+        self.record = None
+        self.ready = threading.Event()
+        self.thread = None
+        self._delivered = False
+
+    def start(self):
+        """Start resolving the font in a daemon thread."""
+        self.thread = threading.Thread(target=self._run, name="font-loader")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.font, self.record = resolve_japanese_font(self.size, self.allow_download)
+        except Exception as e:
+            print(f"Background font loading failed: {e}")
+        finally:
+            self.ready.set()
+
+    def poll(self):
+        """Return the resolved font once, the first time it is ready; otherwise None."""
+        if self._delivered or not self.ready.is_set():
+            return None
+        self._delivered = True
+        return self.font
+
+    def font_at_size(self, size):
+        """Load the resolved font at another size, or None if there is no Japanese font."""
+        if not self.record or not self.record["japanese"]:
+            return None
+        try:
+            return pygame.font.Font(self.record["path"], size)
+        except Exception:
+            return None
@@ -0,0 +1,97 @@
+import unittest
+
+from ai_services import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def make_breaker(self, state=CircuitBreaker.CLOSED):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=15.0)
+        breaker.force(state == CircuitBreaker.CLOSED)
+        return breaker
+
+    def expire_timeout(self, breaker):
+        breaker.opened_at -= breaker.reset_timeout + 1
+
+    def test_starts_open_until_probed(self):
+        breaker = CircuitBreaker("test")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow_request())
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.make_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_success_resets_failure_count(self):
+        breaker = self.make_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_allow_request_half_opens_after_timeout(self):
+        breaker = self.make_breaker(CircuitBreaker.OPEN)
+        self.expire_timeout(breaker)
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_is_open_does_not_change_state(self):
+        breaker = self.make_breaker(CircuitBreaker.OPEN)
+        self.assertTrue(breaker.is_open)
+        self.expire_timeout(breaker)
+        self.assertFalse(breaker.is_open)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_failure_reopens_immediately(self):
+        breaker = self.make_breaker(CircuitBreaker.OPEN)
+        self.expire_timeout(breaker)
+        breaker.allow_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.is_open)
+
+    def test_half_open_success_closes(self):
+        breaker = self.make_breaker(CircuitBreaker.OPEN)
+        self.expire_timeout(breaker)
+        breaker.allow_request()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_healthy_probe_half_opens(self):
+        breaker = CircuitBreaker("test")
+        breaker.record_health(True, checked_at=breaker.opened_at + 1)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_failed_probe_opens(self):
+        breaker = self.make_breaker()
+        breaker.record_health(False, checked_at=breaker.health_checked_at + 1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_stale_probe_is_ignored(self):
+        breaker = self.make_breaker()
+        breaker.record_health(True, checked_at=100)
+        breaker.record_health(False, checked_at=50)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stats(self):
+        breaker = self.make_breaker()
+        breaker.record_success()
+        for _ in range(3):
+            breaker.record_failure()
+        stats = breaker.stats()
+        self.assertEqual(stats["state"], CircuitBreaker.OPEN)
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["failures"], 3)
+        self.assertAlmostEqual(stats["failure_rate"], 0.75)
+        self.assertEqual(stats["open_count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+import numpy as np
+
+from ai_services import MicrophoneStream
+
+
+def make_stream(buffer_seconds=1):
+    # rate 10 keeps the ring at ten samples per second
+    return MicrophoneStream(10, 4, buffer_seconds=buffer_seconds)
+
+
+class MicrophoneStreamTest(unittest.TestCase):
+    def test_write_and_read_back(self):
+        mic = make_stream()
+        mic.write(np.arange(6, dtype=np.int16))
+        self.assertEqual(mic.position, 6)
+        self.assertEqual(mic.oldest(), 0)
+        self.assertEqual(mic.samples(2, 5).tolist(), [2, 3, 4])
+
+    def test_write_wraps_around(self):
+        mic = make_stream()
+        mic.write(np.arange(8, dtype=np.int16))
+        mic.write(np.arange(8, 14, dtype=np.int16))
+        self.assertEqual(mic.position, 14)
+        self.assertEqual(mic.oldest(), 4)
+        self.assertEqual(mic.samples(4, 14).tolist(), list(range(4, 14)))
+        self.assertEqual(mic.samples(7, 12).tolist(), list(range(7, 12)))
+
+    def test_oversized_write_keeps_the_tail(self):
+        mic = make_stream()
+        mic.write(np.arange(3, dtype=np.int16))
+        mic.write(np.arange(3, 28, dtype=np.int16))
+        self.assertEqual(mic.position, 28)
+        self.assertEqual(mic.oldest(), 18)
+        self.assertEqual(mic.samples(0, 28).tolist(), list(range(18, 28)))
+
+    def test_samples_clamped_to_ring(self):
+        mic = make_stream()
+        mic.write(np.arange(15, dtype=np.int16))
+        # Positions that have already been overwritten are dropped
+        self.assertEqual(mic.samples(0, 8).tolist(), [5, 6, 7])
+        self.assertEqual(len(mic.samples(8, 8)), 0)
+        self.assertEqual(len(mic.samples(0, 3)), 0)
+
+    def test_read_waits_for_samples(self):
+        mic = make_stream()
+        mic.write(np.arange(3, dtype=np.int16))
+        timer = threading.Timer(0.05, mic.write, [np.arange(3, 6, dtype=np.int16)])
+        timer.start()
+        self.assertEqual(mic.read(1, 4, timeout=2).tolist(), [1, 2, 3, 4])
+        timer.join()
+
+    def test_read_times_out(self):
+        mic = make_stream()
+        mic.write(np.arange(3, dtype=np.int16))
+        self.assertIsNone(mic.read(0, 5, timeout=0.05))
+
+    def test_not_open_until_opened(self):
+        self.assertFalse(make_stream().is_open)
+
+
+if __name__ == "__main__":
+    unittest.main()
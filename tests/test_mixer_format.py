@@ -0,0 +1,77 @@
+import struct
+import unittest
+
+import numpy as np
+import pygame
+
+import ai_services
+from ai_services import AIServiceClient, choose_mixer_buffer, make_wav, parse_wav_header
+
+
+def setUpModule():
+    ai_services.use_dummy_drivers()
+
+
+class ChooseMixerBufferTest(unittest.TestCase):
+    def test_smallest_power_of_two_covering_latency(self):
+        self.assertEqual(choose_mixer_buffer(44100, 40), 2048)
+        self.assertEqual(choose_mixer_buffer(48000, 20), 1024)
+
+    def test_clamped_between_512_and_4096(self):
+        self.assertEqual(choose_mixer_buffer(44100, 1), 512)
+        self.assertEqual(choose_mixer_buffer(44100, 500), 4096)
+
+
+class MakeWavTest(unittest.TestCase):
+    def test_round_trips_through_parse_wav_header(self):
+        pcm = np.arange(300, dtype="<i2").tobytes()
+        wav = make_wav(pcm, 22050, 2, -16)
+        fmt, data_offset, data_size = parse_wav_header(wav)
+        self.assertEqual(fmt, {"rate": 22050, "channels": 2, "sample_width": 2, "is_float": False})
+        self.assertEqual(wav[data_offset:data_offset + data_size], pcm)
+
+    def test_float_samples(self):
+        wav = make_wav(np.zeros(4, dtype="<f4").tobytes(), 44100, 1, 32)
+        fmt, _, data_size = parse_wav_header(wav)
+        self.assertTrue(fmt["is_float"])
+        self.assertEqual(fmt["sample_width"], 4)
+        self.assertEqual(data_size, 16)
+
+
+class PrepareClipTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = AIServiceClient(check_on_startup=False)
+        if not pygame.mixer.get_init():
+            raise unittest.SkipTest("no mixer available")
+        frequency, size, channels = pygame.mixer.get_init()
+        cls.mixer_format = (frequency, size, channels)
+
+    def tts_clip(self, data_size=None):
+        pcm = (np.sin(np.arange(22050) * 0.1) * 8000).astype("<i2").tobytes()
+        wav = bytearray(make_wav(pcm, 22050, 1, -16))
+        if data_size is not None:
+            struct.pack_into("<I", wav, 40, data_size)
+        return bytes(wav)
+
+    def test_converts_to_mixer_format(self):
+        converted = self.client._prepare_clip(self.tts_clip())
+        fmt, _, data_size = parse_wav_header(converted)
+        frequency, size, channels = self.mixer_format
+        self.assertEqual((fmt["rate"], fmt["channels"]), (frequency, channels))
+        # One second of audio in, about one second out
+        self.assertAlmostEqual(data_size / (frequency * channels * abs(size) // 8), 1.0, places=2)
+
+    def test_unknown_data_size_reads_to_end(self):
+        expected = self.client._prepare_clip(self.tts_clip())
+        for unknown in (0, 0xFFFFFFFF):
+            converted = self.client._prepare_clip(self.tts_clip(data_size=unknown))
+            self.assertEqual(len(converted), len(expected))
+
+    def test_non_wav_passes_through(self):
+        data = b"OggS" + b"\x00" * 100
+        self.assertIs(self.client._prepare_clip(data), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import io
+import unittest
+import wave
+
+import numpy as np
+
+from ai_services import PCMConverter, parse_wav_header
+
+
+def wav_bytes(samples, rate=22050, channels=1, sample_width=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(samples)
+    return buffer.getvalue()
+
+
+def pcm16(values):
+    return np.asarray(values, dtype="<i2").tobytes()
+
+
+def frames16(raw, channels):
+    return np.frombuffer(raw, dtype="<i2").reshape(-1, channels)
+
+
+class ParseWavHeaderTest(unittest.TestCase):
+    def test_parses_format_and_data_chunk(self):
+        data = wav_bytes(pcm16(range(100)), rate=22050, channels=1)
+        fmt, data_offset, data_size = parse_wav_header(data)
+        self.assertEqual(fmt, {"rate": 22050, "channels": 1, "sample_width": 2, "is_float": False})
+        self.assertEqual(data_offset, 44)
+        self.assertEqual(data_size, 200)
+
+    def test_needs_more_bytes(self):
+        data = wav_bytes(pcm16(range(100)))
+        self.assertIsNone(parse_wav_header(data[:8]))
+        self.assertIsNone(parse_wav_header(data[:30]))
+
+    def test_skips_other_chunks(self):
+        data = wav_bytes(pcm16(range(10)))
+        # Insert a LIST chunk with an odd size (padded to even) before the data chunk
+        extra = b"LIST" + (3).to_bytes(4, "little") + b"abc\x00"
+        data = data[:36] + extra + data[36:]
+        fmt, data_offset, data_size = parse_wav_header(data)
+        self.assertEqual(data_offset, 44 + len(extra))
+        self.assertEqual(data_size, 20)
+
+    def test_rejects_non_wav(self):
+        with self.assertRaises(ValueError):
+            parse_wav_header(b"OggS" + b"\x00" * 40)
+
+
+class PCMConverterTest(unittest.TestCase):
+    def test_same_format_passes_through(self):
+        raw = pcm16([[1, 2], [3, 4], [-5, 6]])
+        converter = PCMConverter(44100, 2, 2, mixer_format=(44100, -16, 2))
+        self.assertEqual(converter.convert(raw), raw)
+
+    def test_upmixes_within_each_frame(self):
+        converter = PCMConverter(44100, 2, 2, mixer_format=(44100, -16, 6))
+        out = frames16(converter.convert(pcm16([[1, 2], [3, 4], [5, 6]])), 6)
+        np.testing.assert_array_equal(out, [[1, 2, 1, 2, 1, 2], [3, 4, 3, 4, 3, 4], [5, 6, 5, 6, 5, 6]])
+
+    def test_mono_to_stereo_duplicates(self):
+        converter = PCMConverter(44100, 1, 2, mixer_format=(44100, -16, 2))
+        out = frames16(converter.convert(pcm16([7, -8])), 2)
+        np.testing.assert_array_equal(out, [[7, 7], [-8, -8]])
+
+    def test_downmixes_to_mono(self):
+        converter = PCMConverter(44100, 2, 2, mixer_format=(44100, -16, 1))
+        out = frames16(converter.convert(pcm16([[100, 300], [-100, -300]])), 1)
+        np.testing.assert_array_equal(out[:, 0], [200, -200])
+
+    def test_decodes_8_bit_and_float(self):
+        converter = PCMConverter(44100, 1, 1, mixer_format=(44100, -16, 1))
+        out = frames16(converter.convert(bytes([128, 255, 0])), 1)[:, 0]
+        np.testing.assert_array_equal(out, [0, 32512, -32768])
+
+        converter = PCMConverter(44100, 1, 4, is_float=True, mixer_format=(44100, -16, 1))
+        out = frames16(converter.convert(np.array([0.5, -1.0], dtype="<f4").tobytes()), 1)[:, 0]
+        np.testing.assert_array_equal(out, [16383, -32767])
+
+    def test_float_output(self):
+        converter = PCMConverter(44100, 1, 2, mixer_format=(44100, 32, 1))
+        out = np.frombuffer(converter.convert(pcm16([32767, 0])), dtype="<f4")
+        np.testing.assert_allclose(out, [1.0, 0.0])
+
+    def test_upsamples_by_interpolation(self):
+        converter = PCMConverter(22050, 1, 2, mixer_format=(44100, -16, 1))
+        out = frames16(converter.convert(pcm16([0, 100, 200, 300])), 1)[:, 0]
+        np.testing.assert_array_equal(out, [0, 50, 100, 150, 200, 250])
+
+    def test_resampling_is_continuous_across_blocks(self):
+        samples = (np.sin(np.arange(4410) * 0.05) * 10000).astype("<i2")
+        whole = PCMConverter(22050, 1, 2, mixer_format=(44100, -16, 1)).convert(samples.tobytes())
+        converter = PCMConverter(22050, 1, 2, mixer_format=(44100, -16, 1))
+        blocks = b"".join(converter.convert(samples[start:start + 333].tobytes())
+                          for start in range(0, len(samples), 333))
+        self.assertEqual(blocks, whole)
+
+    def test_keeps_partial_frames_for_the_next_block(self):
+        converter = PCMConverter(44100, 2, 2, mixer_format=(44100, -16, 2))
+        raw = pcm16([[1, 2], [3, 4]])
+        self.assertEqual(converter.convert(raw[:5]), raw[:4])
+        self.assertEqual(converter.convert(raw[5:]), raw[4:])
+
+    def test_rejects_unsupported_mixer_size(self):
+        with self.assertRaises(ValueError):
+            PCMConverter(44100, 1, 2, mixer_format=(44100, 8, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
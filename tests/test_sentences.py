@@ -0,0 +1,46 @@
+import unittest
+
+from ai_services import split_into_sentences
+
+
+class SplitIntoSentencesTest(unittest.TestCase):
+    def test_splits_english_sentences(self):
+        self.assertEqual(
+            split_into_sentences("Welcome to Tokyo station. Where would you like to go today?"),
+            ["Welcome to Tokyo station.", "Where would you like to go today?"])
+
+    def test_splits_japanese_sentences(self):
+        self.assertEqual(
+            split_into_sentences("東京駅へようこそ。どこへ行きますか？", min_chars=5),
+            ["東京駅へようこそ。", "どこへ行きますか？"])
+
+    def test_keeps_decimals_and_prices_whole(self):
+        self.assertEqual(
+            split_into_sentences("That will be $25.50 please. The train leaves in 3.5 minutes.", min_chars=0),
+            ["That will be $25.50 please.", "The train leaves in 3.5 minutes."])
+
+    def test_merges_short_pieces_into_the_next(self):
+        self.assertEqual(
+            split_into_sentences("Woof! Woof! I am Hachiko, your guide."),
+            ["Woof! Woof! I am Hachiko, your guide."])
+
+    def test_short_tail_joins_previous_without_extra_space(self):
+        self.assertEqual(split_into_sentences("ありがとうございます。はい。"), ["ありがとうございます。はい。"])
+        self.assertEqual(
+            split_into_sentences("The next train leaves soon. Hurry!"),
+            ["The next train leaves soon. Hurry!"])
+
+    def test_breaks_long_sentences_at_clauses(self):
+        text = "First part of the sentence, second part of the sentence, third part of it."
+        pieces = split_into_sentences(text, max_chars=40)
+        self.assertEqual(pieces, ["First part of the sentence,", "second part of the sentence,",
+                                  "third part of it."])
+        self.assertTrue(all(len(piece) <= 40 for piece in pieces))
+
+    def test_text_without_punctuation(self):
+        self.assertEqual(split_into_sentences("hello there"), ["hello there"])
+        self.assertEqual(split_into_sentences(""), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+
+from ai_services import make_wav, sniff_audio_format
+
+
+class SniffAudioFormatTest(unittest.TestCase):
+    def test_known_containers(self):
+        self.assertEqual(sniff_audio_format(make_wav(b"\x00\x00", 16000, 1, -16)), "wav")
+        self.assertEqual(sniff_audio_format(b"OggS\x00\x02" + b"\x00" * 20), "ogg")
+        self.assertEqual(sniff_audio_format(b"fLaC\x00\x00\x00\x22"), "flac")
+        self.assertEqual(sniff_audio_format(b"ID3\x04\x00\x00"), "mp3")
+        self.assertEqual(sniff_audio_format(b"\xff\xfb\x90\x64"), "mp3")
+
+    def test_unknown_data(self):
+        self.assertIsNone(sniff_audio_format(b"{\"audio\": 1}"))
+        self.assertIsNone(sniff_audio_format(b""))
+        self.assertIsNone(sniff_audio_format(b"RIFF\x00\x00\x00\x00AVI "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import pygame
+
+import ai_services
+from ai_services import SoundCache, TTSCache, init_audio, make_wav
+
+
+class SizeOfHookTest(unittest.TestCase):
+    def test_subclass_decides_entry_size(self):
+        class CountingCache(TTSCache):
+            def size_of(self, value):
+                return value
+
+        cache = CountingCache(10)
+        cache.put("a", 6)
+        cache.put("b", 6)
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.size, 6)
+
+
+class SoundCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ai_services.use_dummy_drivers()
+        init_audio()
+        if not pygame.mixer.get_init():
+            raise unittest.SkipTest("no mixer available")
+
+    def test_key_is_content_hash(self):
+        clip = make_wav(b"\x01\x00" * 100, 22050, 1, -16)
+        self.assertEqual(SoundCache.key_for(clip), SoundCache.key_for(bytes(clip)))
+        self.assertNotEqual(SoundCache.key_for(clip), SoundCache.key_for(clip + b"\x00\x00"))
+
+    def test_bounded_by_decoded_pcm_size(self):
+        frequency, size, channels = pygame.mixer.get_init()
+        frame_bytes = channels * abs(size) // 8
+        # Half a second of mixer-format audio per sound
+        sound = pygame.mixer.Sound(buffer=b"\x00" * (frequency // 2 * frame_bytes))
+        cache = SoundCache(frequency * frame_bytes)
+        self.assertEqual(cache.size_of(sound), frequency // 2 * frame_bytes)
+        cache.put("a", sound)
+        cache.put("b", sound)
+        cache.put("c", sound)
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.size, frequency * frame_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
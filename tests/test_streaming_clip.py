@@ -0,0 +1,84 @@
+import io
+import unittest
+import wave
+
+from ai_services import StreamingClip
+
+
+def wav_bytes(frames=2000, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x01\x00" * frames)
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    """Streams a body in chunks; closing it ends the iteration quietly, like a closed socket."""
+
+    def __init__(self, body, headers=None, chunk_size=1000, on_chunk=None):
+        self.body = body
+        self.headers = headers or {}
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.chunk_size):
+            if self.closed:
+                return
+            yield self.body[start:start + self.chunk_size]
+            if self.on_chunk is not None:
+                self.on_chunk()
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingClipTest(unittest.TestCase):
+    def setUp(self):
+        self.cached = []
+
+    def test_complete_download_is_passed_on(self):
+        body = wav_bytes()
+        clip = StreamingClip(FakeResponse(body, {"Content-Length": str(len(body))}),
+                             on_complete=self.cached.append)
+        self.assertEqual(clip.read_all(), body)
+        self.assertEqual(self.cached, [body])
+        self.assertTrue(clip.response.closed)
+
+    def test_chunked_download_without_length_is_passed_on(self):
+        body = wav_bytes()
+        clip = StreamingClip(FakeResponse(body), on_complete=self.cached.append)
+        clip.read_all()
+        self.assertEqual(self.cached, [body])
+
+    def test_clip_closed_mid_download_is_not_passed_on(self):
+        body = wav_bytes()
+        response = FakeResponse(body)
+        clip = StreamingClip(response, on_complete=self.cached.append)
+        # Closed from elsewhere (a cancelled job) after the first chunk
+        response.on_chunk = clip.close
+        clip.read_all()
+        self.assertLess(len(clip.body), len(body))
+        self.assertEqual(self.cached, [])
+
+    def test_body_shorter_than_content_length_is_not_passed_on(self):
+        body = wav_bytes()
+        clip = StreamingClip(FakeResponse(body[:3000], {"Content-Length": str(len(body))}),
+                             on_complete=self.cached.append)
+        clip.read_all()
+        self.assertEqual(self.cached, [])
+
+    def test_body_shorter_than_wav_data_size_is_not_passed_on(self):
+        body = wav_bytes()
+        clip = StreamingClip(FakeResponse(body[:3000]), on_complete=self.cached.append)
+        clip.read_all()
+        self.assertFalse(clip.is_complete())
+        self.assertEqual(self.cached, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from ai_services import trim_silence
+
+RATE = 1000  # 10-sample windows, 150-sample margin
+
+
+def recording(quiet_before, loud, quiet_after, level=2000):
+    return np.concatenate([
+        np.zeros(quiet_before, dtype=np.int16),
+        np.full(loud, level, dtype=np.int16),
+        np.zeros(quiet_after, dtype=np.int16),
+    ])
+
+
+class TrimSilenceTest(unittest.TestCase):
+    def test_keeps_margin_around_speech(self):
+        samples = recording(500, 300, 500)
+        self.assertEqual(trim_silence(samples, RATE, 500), (350, 950))
+
+    def test_margin_clamped_to_recording(self):
+        samples = recording(50, 300, 20)
+        self.assertEqual(trim_silence(samples, RATE, 500), (0, 370))
+
+    def test_silent_recording(self):
+        samples = recording(500, 300, 500, level=100)
+        self.assertEqual(trim_silence(samples, RATE, 500), (0, 0))
+
+    def test_shorter_than_a_window(self):
+        samples = np.zeros(5, dtype=np.int16)
+        self.assertEqual(trim_silence(samples, RATE, 500), (0, 5))
+
+    def test_quiet_gap_inside_speech_is_kept(self):
+        samples = np.concatenate([recording(500, 100, 400), recording(0, 100, 500)])
+        self.assertEqual(trim_silence(samples, RATE, 500), (350, 1250))
+
+    def test_custom_margin(self):
+        samples = recording(500, 300, 500)
+        self.assertEqual(trim_silence(samples, RATE, 500, keep_seconds=0), (500, 800))
+
+
+if __name__ == "__main__":
+    unittest.main()
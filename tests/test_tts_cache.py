@@ -0,0 +1,59 @@
+import unittest
+
+from ai_services import TTSCache
+
+
+class TTSCacheTest(unittest.TestCase):
+    def test_get_counts_hits_and_misses(self):
+        cache = TTSCache(100)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", b"x" * 10)
+        self.assertEqual(cache.get("a"), b"x" * 10)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+    def test_tracks_size_in_bytes(self):
+        cache = TTSCache(100)
+        cache.put("a", b"x" * 10)
+        cache.put("b", b"x" * 25)
+        self.assertEqual(cache.size, 35)
+        # Replacing an entry counts only the new value
+        cache.put("a", b"x" * 5)
+        self.assertEqual(cache.size, 30)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTSCache(30)
+        cache.put("a", b"x" * 10)
+        cache.put("b", b"x" * 10)
+        cache.put("c", b"x" * 10)
+        cache.get("a")
+        cache.put("d", b"x" * 10)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertIn("d", cache)
+        self.assertEqual(cache.size, 30)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_large_entry_evicts_several(self):
+        cache = TTSCache(30)
+        for key in "abc":
+            cache.put(key, b"x" * 10)
+        cache.put("big", b"x" * 25)
+        self.assertEqual(list(cache._entries), ["big"])
+        self.assertEqual(cache.size, 25)
+        self.assertEqual(cache.evictions, 3)
+
+    def test_entry_larger_than_cache_is_not_stored(self):
+        cache = TTSCache(30)
+        cache.put("a", b"x" * 10)
+        cache.put("huge", b"x" * 31)
+        self.assertNotIn("huge", cache)
+        self.assertIn("a", cache)
+        self.assertEqual(cache.size, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
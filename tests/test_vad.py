@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from ai_services import VoiceActivityDetector
+
+RATE = 16000
+CHUNK = 512  # 32 ms
+
+
+def tone(rms, samples=CHUNK):
+    """A square wave chunk with the given RMS energy."""
+    values = np.full(samples, rms, dtype=np.int16)
+    values[1::2] *= -1
+    return values
+
+
+def feed(vad, rms, seconds):
+    results = [vad.process(tone(rms)) for _ in range(int(seconds * RATE / CHUNK))]
+    return results
+
+
+class VoiceActivityDetectorTest(unittest.TestCase):
+    def test_energy_is_rms(self):
+        self.assertAlmostEqual(VoiceActivityDetector.energy(tone(1000)), 1000.0, places=3)
+        self.assertAlmostEqual(VoiceActivityDetector.energy(tone(1000).tobytes()), 1000.0, places=3)
+        self.assertEqual(VoiceActivityDetector.energy(b""), 0.0)
+
+    def test_threshold_follows_noise_floor(self):
+        vad = VoiceActivityDetector(RATE)
+        self.assertEqual(vad.threshold, vad.min_energy)
+        feed(vad, 50, 1.0)
+        self.assertEqual(vad.threshold, vad.min_energy)
+        vad = VoiceActivityDetector(RATE)
+        feed(vad, 200, 1.0)
+        self.assertAlmostEqual(vad.threshold, 200 * vad.speech_ratio, delta=1)
+
+    def test_speech_then_silence_ends_utterance(self):
+        vad = VoiceActivityDetector(RATE)
+        self.assertEqual(set(feed(vad, 50, 0.5)), {VoiceActivityDetector.SILENCE})
+        self.assertEqual(set(feed(vad, 3000, 0.5)), {VoiceActivityDetector.SPEECH})
+        results = feed(vad, 50, 1.0)
+        end = results.index(VoiceActivityDetector.END)
+        # Ends after the default 0.7 s of silence
+        self.assertAlmostEqual((end + 1) * CHUNK / RATE, 0.7, delta=CHUNK / RATE)
+        self.assertAlmostEqual(vad.speech_seconds, 0.5, delta=CHUNK / RATE)
+
+    def test_gives_up_without_speech(self):
+        vad = VoiceActivityDetector(RATE, no_speech_timeout=1.0)
+        results = feed(vad, 50, 1.5)
+        self.assertIn(VoiceActivityDetector.END, results)
+        self.assertAlmostEqual((results.index(VoiceActivityDetector.END) + 1) * CHUNK / RATE, 1.0,
+                               delta=CHUNK / RATE)
+
+    def test_hysteresis_keeps_speech_going(self):
+        vad = VoiceActivityDetector(RATE)
+        feed(vad, 3000, 0.2)
+        # Below the start threshold but above two thirds of it
+        self.assertEqual(vad.process(tone(vad.min_energy * 0.8)), VoiceActivityDetector.SPEECH)
+        vad = VoiceActivityDetector(RATE)
+        self.assertEqual(vad.process(tone(vad.min_energy * 0.8)), VoiceActivityDetector.SILENCE)
+
+    def test_speech_does_not_raise_noise_floor(self):
+        vad = VoiceActivityDetector(RATE)
+        feed(vad, 50, 0.5)
+        floor = vad.noise_floor
+        feed(vad, 5000, 1.0)
+        self.assertEqual(vad.noise_floor, floor)
+
+    def test_end_silence_adapts_to_pauses(self):
+        vad = VoiceActivityDetector(RATE)
+        self.assertEqual(vad.end_silence, 0.7)
+        vad.pauses.extend([0.1] * 5)
+        self.assertEqual(vad.end_silence, vad.min_end_silence)
+        vad.pauses.extend([1.0] * 20)
+        self.assertEqual(vad.end_silence, vad.max_end_silence)
+        vad.pauses.clear()
+        vad.pauses.extend([0.4] * 5)
+        self.assertAlmostEqual(vad.end_silence, 0.6)
+
+    def test_records_mid_utterance_pauses(self):
+        vad = VoiceActivityDetector(RATE)
+        feed(vad, 3000, 0.3)
+        feed(vad, 50, 0.32)
+        feed(vad, 3000, 0.3)
+        self.assertEqual(len(vad.pauses), 1)
+        self.assertAlmostEqual(vad.pauses[0], 0.32, delta=CHUNK / RATE)
+
+    def test_reset_keeps_noise_floor_and_pauses(self):
+        vad = VoiceActivityDetector(RATE)
+        feed(vad, 200, 0.5)
+        vad.pauses.append(0.3)
+        vad.reset()
+        self.assertIsNotNone(vad.noise_floor)
+        self.assertEqual(list(vad.pauses), [0.3])
+        self.assertFalse(vad.heard_speech)
+        self.assertEqual(vad.speech_seconds, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
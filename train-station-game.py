@@ -1,15 +1,14 @@
 import pygame
 import sys
 import math
-import os
-from ai_services import AIServiceClient  # Import our AI services
-import threading
+from ai_services import AIServiceClient, init_audio, use_dummy_drivers, HEADLESS_MODE  # Import our AI services
 import traceback
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import fonts  # Japanese font resolution and caching
+from asset_manager import AssetManager  # Image loading and sprite atlas
 import pyperclip  # For clipboard operations
 
-# Initialize pygame
-pygame.init()
-
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -27,106 +26,100 @@ VOICE_ACTIVE_COLOR = (255, 0, 0)
 VOICE_INACTIVE_COLOR = (100, 100, 100)
 PROGRESS_BG_COLOR = (0, 0, 0, 180)  # Background color for progress text with alpha
 
+# Character sprites packed together into the sprite atlas
+CHARACTER_SPRITES = [
+    "assets/player.png",
+    "assets/dog.png",
+    "assets/info_attendant.png",
+    "assets/ticket_attendant.png",
+    "assets/conductor1.png",
+    "assets/conductor2.png",
+    "assets/conductor3.png"
+]
+
 # Game states
 STATE_EXPLORING = 0
 STATE_DIALOGUE = 1
 STATE_VOICE_INPUT = 2  # New state for voice input
 
+# Stages of a voice turn, advanced by DialogueSystem.update() once per frame
+VOICE_RECORDING = "recording"
+VOICE_TRANSCRIBING = "transcribing"
+VOICE_THINKING = "thinking"
+VOICE_SPEAKING = "speaking"
+
+# Longest a voice recording may run before it is cut off
+VOICE_MAX_SECONDS = 5
+
+# Push-to-talk: a recording held on the V key runs until the key is released (up to
+# VOICE_MAX_HOLD_SECONDS); a press shorter than PUSH_TO_TALK_TAP_SECONDS is treated as a tap
+# and the recording ends by itself at the end of speech instead
+VOICE_MAX_HOLD_SECONDS = 20
+PUSH_TO_TALK_TAP_SECONDS = 0.3
+
 # Progression states
 NEED_INFO = 0
 NEED_TICKET = 1
 NEED_STATION_PLATFORM_ATTENDANT = 2
 GAME_COMPLETE = 3
 
-# Setup the screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Train Station Adventure")
-clock = pygame.time.Clock()
+# Display, font and background are created by init_game(), not at import time,
+# so the game's classes can be imported without opening a window
+screen = None
+clock = None
+font = None
+font_loader = None
+
+def init_display(headless=False):
+    """Open the game window (or a dummy one in headless mode)."""
+    global screen, clock
+    if headless:
+        use_dummy_drivers()
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Train Station Adventure")
+    clock = pygame.time.Clock()
+    return screen
 
-# Try to use a font that supports Japanese characters
-try:
-    # Expanded list of fonts that support Japanese
-    available_fonts = pygame.font.get_fonts()
-    japanese_fonts = [f for f in available_fonts if f in [
-        'msgothic', 'meiryo', 'hiragino kaku gothic pro', 'ms gothic', 'yu gothic',
-        'stsong', 'simsun', 'nsimsun', 'malgungothic', 'microsoftyahei', 'microsoftjhenghei',
-        'yugothic', 'stxihei', 'fzshuti', 'fzyaoti'
-    ]]
+def init_fonts():
+    """Set up the global font, resolving the Japanese font in the background if needed."""
+    global font, font_loader
+    pygame.font.init()
     
-    if japanese_fonts:
-        font = pygame.font.SysFont(japanese_fonts[0], FONT_SIZE)
-        print(f"Using Japanese-compatible font: {japanese_fonts[0]}")
-    else:
-        # Try to download a font from multiple sources
-        font_downloaded = False
-        
-        # Create fonts directory if it doesn't exist
-        os.makedirs("assets/fonts", exist_ok=True)
-        
-        try:
-            # First try to find any installed font that can render Japanese
-            all_fonts = pygame.font.get_fonts()
-            for test_font in all_fonts:
-                try:
-                    test = pygame.font.SysFont(test_font, FONT_SIZE)
-                    # Test if the font can render Japanese
-                    test.render("こんにちは", True, (0, 0, 0))
-                    font = test
-                    print(f"Found system font that supports Japanese: {test_font}")
-                    font_downloaded = True
-                    break
-                except:
-                    continue
-        except Exception as e:
-            print(f"Error finding system fonts: {e}")
-            
-        # If no system font worked, try downloading
-        if not font_downloaded:
-            urls = [
-                "https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/NotoSansCJKjp-Regular.otf",
-                "https://github.com/googlefonts/noto-cjk/raw/main/Sans/Variable/OTF/NotoSansCJKjp-VF.otf",
-                "https://github.com/googlefonts/noto-cjk/raw/main/Sans/OTF/Japanese/NotoSansJP-Regular.otf",
-                "https://github.com/googlefonts/google-fonts/raw/main/ofl/notosansjp/NotoSansJP-Regular.ttf"
-            ]
-            
-            for url in urls:
-                try:
-                    import urllib.request
-                    import shutil
-                    
-                    filename = url.split('/')[-1]
-                    local_path = f"assets/fonts/{filename}"
-                    
-                    print(f"Downloading Japanese font from {url}...")
-                    urllib.request.urlretrieve(url, local_path)
-                    
-                    # Try to load the downloaded font
-                    font = pygame.font.Font(local_path, FONT_SIZE)
-                    # Test if it can render Japanese
-                    font.render("こんにちは", True, (0, 0, 0))
-                    print(f"Downloaded and loaded Japanese font successfully from {url}")
-                    font_downloaded = True
-                    break
-                except Exception as download_error:
-                    print(f"Failed to download or use font from {url}: {download_error}")
-                    continue
-            
-        # If all download attempts failed, try to use a default monospace font
-        if not font_downloaded:
-            try:
-                font = pygame.font.SysFont("monospace", FONT_SIZE)
-                print("Using default monospace font - Japanese may not display correctly")
-            except:
-                # Last resort - use pygame default font
-                font = pygame.font.Font(None, FONT_SIZE)
-                print("Using pygame default font - Japanese may not display correctly")
-except Exception as e:
-    # If there's any error, use the default font
-    font = pygame.font.Font(None, FONT_SIZE)
-    print(f"Error loading font: {e}, using default")
+    # Use the cached Japanese font when there is one. Otherwise start with a provisional
+    # font and resolve the real one (local bundle, system fonts, then an optional download)
+    # on a background loader, so the window never waits on the font probe or the network.
+    try:
+        font = fonts.load_cached_font(FONT_SIZE)
+        if font is None:
+            font = pygame.font.Font(None, FONT_SIZE)
+            font_loader = fonts.BackgroundFontLoader(FONT_SIZE).start()
+    except Exception as e:
+        # If there's any error, use the default font
+        font = pygame.font.Font(None, FONT_SIZE)
+        print(f"Error loading font: {e}, using default")
+    return font
+
+# Fonts that have been hot-swapped out, mapped to their replacement, so anything still
+# holding the provisional font renders with the real one
+font_substitutions = {}
+
+def install_font(new_font, text_boxes=()):
+    """Hot-swap the global font, the text boxes and safe_render over to a newly loaded font."""
+    global font
+    if new_font is None or new_font is font:
+        return
+    font_substitutions[font] = new_font
+    font = new_font
+
+    japanese_font = font_loader.font_at_size(FONT_SIZE + 4) if font_loader else None
+    for text_box in text_boxes:
+        text_box.set_font(new_font, japanese_font)
+    print("Switched to the background-loaded font")
 
 # Create a special render function that handles Japanese text rendering failures gracefully
 def safe_render(text, font, color):
+    font = font_substitutions.get(font, font)
     try:
         # Try to render the whole text
         return font.render(text, True, color)
@@ -166,10 +159,34 @@ def safe_render(text, font, color):
             # If nothing could be rendered, return an empty surface
             return pygame.Surface((10, font.get_linesize()), pygame.SRCALPHA)
 
-# Load background image and keep original size
-background = pygame.image.load("assets/station-3-tracks.png")
-MAP_WIDTH = background.get_width()
-MAP_HEIGHT = background.get_height()
+# Images are loaded once and converted to the display format
+assets = AssetManager()
+
+# Map size comes from the background image once it is loaded
+background = None
+MAP_WIDTH = 1024
+MAP_HEIGHT = 1024
+
+def load_assets():
+    """Load the background (keeping its original size) and pack the character sprites."""
+    global background, MAP_WIDTH, MAP_HEIGHT
+    background = assets.load_image("assets/station-3-tracks.png", alpha=False)
+    MAP_WIDTH = background.get_width()
+    MAP_HEIGHT = background.get_height()
+    
+    # Pack all character sprites into one atlas before creating the characters
+    assets.build_atlas(CHARACTER_SPRITES)
+    assets.report()
+
+def init_game(headless=HEADLESS_MODE):
+    """Initialize everything the game needs: display, audio, fonts and assets.
+    
+    With headless=True (or GAME_HEADLESS=1) SDL's dummy video and audio drivers are used.
+    """
+    init_display(headless)
+    init_audio(headless=headless)
+    init_fonts()
+    load_assets()
 
 # Camera offset
 camera_x = 0
@@ -194,7 +211,7 @@ class Character:
         self.height = 64
         self.name = name
         self.rect = pygame.Rect(x, y, self.width, self.height)
-        self.image = pygame.image.load(image_path)
+        self.image = assets.sprite(image_path)
     
     def draw(self, screen, camera_x, camera_y):
         # Draw the character sprite with camera offset
@@ -397,6 +414,13 @@ class NPC(Character):
             # Loop back to first response if we've gone through all dialogue
             self.dialogue_state = 0
             return self.dialogue["default"][0]
+    
+    def scripted_lines(self):
+        """Every line this NPC can say from its scripted dialogue."""
+        lines = []
+        for key, value in self.dialogue.items():
+            lines.extend(value if key == "default" else [value])
+        return lines
             
     def follow(self, target_x, target_y, obstacles):
         # Only the dog should follow
@@ -461,13 +485,38 @@ class ScrollableTextBox:
         self.selection_start_pos = None
         self.selection_end_pos = None
         
-        # Create larger fonts for headers and Japanese text
+        # Create larger fonts for headers and Japanese text. The Japanese font is looked
+        # up on first use, since a system font lookup scans every installed font.
         try:
             self.header_font = pygame.font.Font(None, FONT_SIZE + 8)
-            self.japanese_font = pygame.font.SysFont('arialunicode', FONT_SIZE + 4)
         except:
             self.header_font = self.font
-            self.japanese_font = self.font
+        self._japanese_font = None
+    
+    @property
+    def japanese_font(self):
+        if self._japanese_font is None:
+            try:
+                self._japanese_font = pygame.font.SysFont('arialunicode', FONT_SIZE + 4)
+            except:
+                self._japanese_font = self.font
+        return self._japanese_font
+    
+    @japanese_font.setter
+    def japanese_font(self, value):
+        self._japanese_font = value
+    
+    def set_font(self, font, japanese_font=None):
+        """Switch to a new font and re-render the current text with it"""
+        self.font = font
+        self.line_height = font.get_linesize()
+        self.visible_lines = (self.rect.height - self.padding * 2) // self.line_height
+        if japanese_font is not None:
+            self.japanese_font = japanese_font
+        if self.text:
+            scroll_position = self.scroll_position
+            self.set_text(self.text)
+            self.scroll_position = min(scroll_position, self.max_scroll)
     
     def set_text(self, text):
         """Set text content and pre-render lines"""
@@ -573,6 +622,29 @@ class ScrollableTextBox:
         # Always scroll to end when new text is set
         self.scroll_to_end()
     
+    def append_text(self, chunk):
+        """Append streamed text, re-wrapping only the last line"""
+        if not chunk:
+            return
+        if self.japanese_mode or "[JP_ORIGINAL:" in self.text + chunk:
+            # Japanese layout depends on the whole text
+            self.set_text(self.text + chunk)
+            return
+        
+        previous = self.text
+        self.text += chunk
+        
+        # Pop the last line and wrap it again together with the new text
+        tail = chunk
+        if self.rendered_lines:
+            _, last_line = self.rendered_lines.pop()
+            separator = " " if previous[-1:].isspace() else ""
+            tail = last_line + separator + chunk
+        self._render_wrapped_text(tail, self.text_color)
+        
+        self.max_scroll = max(0, len(self.rendered_lines) - self.visible_lines)
+        self.scroll_to_end()
+    
     def _render_wrapped_text(self, text, color):
         """Render text with word wrapping using safe_render"""
         words = text.split()
@@ -873,9 +945,7 @@ class DialogueSystem:
             40
         )
         
-        self.voice_active = False
         self.ai_client = AIServiceClient()
-        self.service_status_message = ""
         
         # Create scrollable text box for output
         self.text_box = ScrollableTextBox(
@@ -886,18 +956,124 @@ class DialogueSystem:
             TEXT_COLOR
         )
         
-        # Check services and set status message
-        services_available = self.ai_client.check_services()
-        if not services_available:
-            if not self.ai_client.asr_available:
-                self.service_status_message = "Speech recognition unavailable."
-            elif not self.ai_client.npc_ai_available:
-                self.service_status_message = "NPC AI unavailable."
-            elif not self.ai_client.tts_available:
-                self.service_status_message = "Text-to-speech unavailable."
-        
         # Initialize clipboard functionality
         self.clipboard_active = False
+        
+        # Dialogue turns run on a worker pool and come back through futures, so the
+        # frame loop keeps running while the services are working
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dialogue")
+        self.pending_response = None  # (npc, player text, future) while waiting on NPC-AI
+        self.stream_chunks = queue.Queue()  # Streamed reply text waiting to be shown
+        self.voice_partials = queue.Queue()  # Partial voice transcripts for the input box
+        
+        # Voice turn state machine: the current stage (None when idle), when recording
+        # started, and the transcription future while it runs
+        self.voice_state = None
+        self.voice_started_at = 0
+        self.pending_transcript = None
+        self.voice_key_held = False  # push-to-talk key is down for the current recording
+        self.voice_recording_id = None  # the AI client's id for this turn's recording
+        
+        # Pulsing "Recording..." bar
+        self.recording_indicator_alpha = 100
+        self.recording_indicator_increasing = True
+    
+    @property
+    def thinking(self):
+        """True while an NPC response is being generated."""
+        return self.pending_response is not None
+    
+    @property
+    def service_status_message(self):
+        """Warning for the first unavailable service, read from the breakers on every frame."""
+        if not self.ai_client.asr_available:
+            return "Speech recognition unavailable."
+        if not self.ai_client.npc_ai_available:
+            return "NPC AI unavailable."
+        if not self.ai_client.tts_available:
+            return "Text-to-speech unavailable."
+        return ""
+    
+    @property
+    def voice_active(self):
+        """True while a voice turn is in progress."""
+        return self.voice_state is not None
+    
+    def speak(self, text):
+        """Speak a line for the current NPC; playback starts with the first synthesized sentence.
+        
+        Lines already in the TTS cache play even while the TTS service is down.
+        """
+        self.ai_client.speak(text, self.current_npc.name)
+    
+    def say_scripted(self, text):
+        """Show and speak a scripted line for the current NPC."""
+        self.output_text = text
+        self.text_box.set_text(text)
+        self.speak(text)
+    
+    def send_turn(self, player_text):
+        """Send the player's text to NPC-AI on the worker pool."""
+        npc = self.current_npc
+        if self.ai_client.stream_npc_responses:
+            # Tokens are shown as they arrive; each turn gets its own queue so a
+            # late chunk from an earlier turn can't leak into this one
+            self.stream_chunks = queue.Queue()
+            self.text_box.set_text("")
+            future = self.executor.submit(self.ai_client.get_npc_response_stream,
+                                          npc.name, player_text, self.stream_chunks.put)
+        else:
+            future = self.executor.submit(self.ai_client.get_npc_response, npc.name, player_text)
+        self.pending_response = (npc, player_text, future)
+    
+    def update(self):
+        """Apply finished dialogue turns. Called once per frame from the game loop."""
+        # Show what the player is saying while they say it (streaming ASR)
+        while True:
+            try:
+                partial = self.voice_partials.get_nowait()
+            except queue.Empty:
+                break
+            if self.voice_state in (VOICE_RECORDING, VOICE_TRANSCRIBING):
+                self.input_text = partial
+        
+        self.update_voice()
+        
+        # Show streamed text as it arrives
+        if self.pending_response and self.active and self.pending_response[0] is self.current_npc:
+            while True:
+                try:
+                    chunk = self.stream_chunks.get_nowait()
+                except queue.Empty:
+                    break
+                self.text_box.append_text(chunk)
+        
+        if self.pending_response and self.pending_response[2].done():
+            npc, player_text, future = self.pending_response
+            self.pending_response = None
+            try:
+                ai_response = future.result()
+            except Exception as e:
+                print(f"Error getting AI response: {e}")
+                ai_response = None
+            
+            # Drop the reply if the player has left this conversation
+            if not self.active or npc is not self.current_npc:
+                return
+            
+            if ai_response:
+                print(f"Response received in handle_input: {ai_response}")
+                # First update the UI with the response text (streamed text is already
+                # there unless the final reply was reformatted, e.g. for Japanese)
+                self.output_text = ai_response
+                if self.text_box.text.strip() != ai_response:
+                    self.text_box.set_text(ai_response)
+                
+                # Then synthesize audio if available (after UI is updated)
+                self.speak(ai_response)
+            else:
+                # Fallback to scripted dialogue
+                self.say_scripted(npc.talk(player_text))
     
     def activate(self, npc):
         self.active = True
@@ -907,16 +1083,16 @@ class DialogueSystem:
         print(f"Activating dialogue with NPC: {npc.name}")
         
         # Just use the predefined initial dialogue - don't try AI yet
-        self.output_text = npc.talk()
-        self.text_box.set_text(self.output_text)
+        self.say_scripted(npc.talk())
         
-        # Clear any error messages
-        self.service_status_message = ""
+        # Warm up the microphone in the background so voice input starts instantly
+        if self.ai_client.asr_available:
+            self.executor.submit(self.ai_client.open_microphone)
     
     def deactivate(self):
+        self.cancel_voice_input()
         self.active = False
         self.current_npc = None
-        self.voice_active = False
     
     def handle_input(self, event, player):
         # First let the text box handle scrolling events and text selection
@@ -944,6 +1120,10 @@ class DialogueSystem:
                 return False
                 
             if event.key == pygame.K_ESCAPE:
+                # Cancel a voice turn that is still listening or transcribing
+                if self.voice_state in (VOICE_RECORDING, VOICE_TRANSCRIBING):
+                    self.cancel_voice_input()
+                    return True
                 # If audio is playing, stop it
                 if hasattr(self.ai_client, 'is_playing_audio') and self.ai_client.is_playing_audio:
                     print("Stopping audio playback")
@@ -957,51 +1137,33 @@ class DialogueSystem:
             if event.key == pygame.K_RETURN:
                 # Process input and get response
                 if self.input_text.strip():
+                    if self.thinking:
+                        # Still waiting on the previous reply
+                        return
+                    
                     # Try AI first if available
                     if self.ai_client.npc_ai_available:
-                        try:
-                            ai_response = self.ai_client.get_npc_response(self.current_npc.name, self.input_text)
-                            if ai_response:
-                                print(f"Response received in handle_input: {ai_response}")
-                                # First update the UI with the response text
-                                self.output_text = ai_response
-                                self.text_box.set_text(ai_response)
-                                # Force update the display immediately
-                                pygame.display.update(self.output_rect)
-                                
-                                # Then play audio if available (after UI is updated)
-                                if self.ai_client.tts_available:
-                                    audio = self.ai_client.text_to_speech(ai_response, self.current_npc.name)
-                                    if audio:
-                                        # Start audio playback after updating the UI
-                                        threading.Thread(target=self.ai_client.play_audio, args=(audio,)).start()
-                            else:
-                                # Fallback to scripted dialogue
-                                self.output_text = self.current_npc.talk(self.input_text)
-                                self.text_box.set_text(self.output_text)
-                        except Exception as e:
-                            print(f"Error getting AI response: {e}")
-                            # Fallback to scripted dialogue
-                            self.output_text = self.current_npc.talk(self.input_text)
-                            self.text_box.set_text(self.output_text)
+                        self.send_turn(self.input_text)
                     else:
                         # Use scripted dialogue if AI is unavailable
-                        self.output_text = self.current_npc.talk(self.input_text)
-                        self.text_box.set_text(self.output_text)
+                        self.say_scripted(self.current_npc.talk(self.input_text))
                     
                     self.input_text = ""
             elif event.key == pygame.K_BACKSPACE:
                 self.input_text = self.input_text[:-1]
             elif event.key == pygame.K_v:
-                # Toggle voice input mode if ASR is available and PyAudio is available
+                # Push-to-talk if ASR is available and PyAudio is available
                 if self.ai_client.asr_available and hasattr(self.ai_client, 'PYAUDIO_AVAILABLE') and self.ai_client.PYAUDIO_AVAILABLE:
-                    self.toggle_voice_input()
+                    self.toggle_voice_input(push_to_talk=True)
                 else:
                     self.output_text = "Voice input is not available."
                     self.text_box.set_text(self.output_text)
             else:
                 self.input_text += event.unicode
         
+        elif event.type == pygame.KEYUP and event.key == pygame.K_v:
+            self.release_voice_key()
+        
         elif event.type == pygame.MOUSEBUTTONDOWN:
             # Right-click to copy selected text
             if event.button == 3 and self.text_box.selected_text:
@@ -1016,39 +1178,113 @@ class DialogueSystem:
                     self.output_text = "Voice input is not available."
                     self.text_box.set_text(self.output_text)
     
-    def toggle_voice_input(self):
-        """Toggle voice input mode and process voice if activated."""
-        if self.voice_active:
-            # Already recording, do nothing
+    def toggle_voice_input(self, push_to_talk=False):
+        """Start a voice turn; the game loop drives it through update_voice().
+        
+        With push_to_talk the recording lasts while the V key is held (see release_voice_key).
+        """
+        if self.voice_active or self.thinking:
+            # Already in a voice turn, or still waiting on a reply
             return
-            
-        self.voice_active = True
         
-        # Process voice in a non-blocking way
-        try:
-            # The process_voice_input now returns a tuple (text, audio)
-            response, audio = self.ai_client.process_voice_input(self.current_npc.name)
+        if not self.ai_client.start_recording(on_partial=self.voice_partials.put, hold=push_to_talk):
+            self.output_text = "Voice input is not available."
+            self.text_box.set_text(self.output_text)
+            return
+        self.voice_recording_id = self.ai_client.recording_id
+        self.ai_client.stop_audio()
+        self.input_text = ""
+        self.voice_state = VOICE_RECORDING
+        self.voice_started_at = pygame.time.get_ticks()
+        self.voice_key_held = push_to_talk
+    
+    def release_voice_key(self):
+        """End a push-to-talk recording when the V key comes up."""
+        if not self.voice_key_held:
+            return
+        self.voice_key_held = False
+        if self.voice_state != VOICE_RECORDING:
+            return
+        held = (pygame.time.get_ticks() - self.voice_started_at) / 1000
+        if held >= PUSH_TO_TALK_TAP_SECONDS:
+            # The player says when they're done, so transcribe right away
+            self._finish_recording()
+        else:
+            # Just a tap: fall back to ending at the end of speech
+            self.ai_client.release_recording()
+    
+    def _finish_recording(self):
+        """Hand the recording to the worker pool for transcription."""
+        self.pending_transcript = self.executor.submit(self._transcribe_voice, self.voice_recording_id)
+        self.voice_state = VOICE_TRANSCRIBING
+    
+    def _transcribe_voice(self, recording_id):
+        """Worker-pool stage: finish the recording and transcribe it.
+        
+        Works on its own recording only, so a turn cancelled meanwhile can't touch the next one.
+        """
+        audio_data = self.ai_client.stop_recording(recording_id)
+        if not audio_data:
+            self.ai_client.cancel_recording(recording_id)
+            return ""
+        return self.ai_client.transcribe_recording(audio_data, recording_id)
+    
+    def update_voice(self):
+        """Advance the voice turn: recording -> transcribing -> thinking -> speaking -> idle."""
+        if self.voice_state == VOICE_RECORDING:
+            elapsed = (pygame.time.get_ticks() - self.voice_started_at) / 1000
+            limit = VOICE_MAX_HOLD_SECONDS if self.voice_key_held else VOICE_MAX_SECONDS
+            # Recording ends by itself at the end of speech (unless V is held), or at the time limit
+            if not self.ai_client.is_recording or elapsed >= limit:
+                self.voice_key_held = False
+                self._finish_recording()
+        
+        elif self.voice_state == VOICE_TRANSCRIBING:
+            if not self.pending_transcript.done():
+                return
+            future, self.pending_transcript = self.pending_transcript, None
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f"Voice input error: {e}")
+                traceback.print_exc()
+                text = ""
             
-            if response:
-                # Update UI first
-                self.output_text = response
-                self.text_box.set_text(response)
-                # Force update
-                pygame.display.update(self.output_rect)
-                
-                # Then play audio if available in a separate thread
-                if audio and self.ai_client.tts_available:
-                    threading.Thread(target=self.ai_client.play_audio, args=(audio,)).start()
+            if not text or not self.active:
+                self.voice_state = None
+                self.input_text = ""
+                if self.active:
+                    self.output_text = "I couldn't hear what you said."
+                    self.text_box.set_text(self.output_text)
+                return
+            
+            print(f"Voice input: {text}")
+            self.input_text = ""
+            if self.ai_client.npc_ai_available:
+                self.send_turn(text)
+                self.voice_state = VOICE_THINKING
             else:
-                self.output_text = "I couldn't understand what you said."
-                self.text_box.set_text("I couldn't understand what you said.")
-        except Exception as e:
-            print(f"Voice input error: {e}")
-            traceback.print_exc()
-            self.output_text = "I couldn't understand what you said."
-            self.text_box.set_text("I couldn't understand what you said.")
-        finally:
-            self.voice_active = False
+                self.say_scripted(self.current_npc.talk(text))
+                self.voice_state = VOICE_SPEAKING
+        
+        elif self.voice_state == VOICE_THINKING:
+            # The reply is applied (and spoken) by update() like a typed turn
+            if not self.thinking:
+                self.voice_state = VOICE_SPEAKING
+        
+        elif self.voice_state == VOICE_SPEAKING:
+            if not self.ai_client.is_playing_audio:
+                self.voice_state = None
+    
+    def cancel_voice_input(self):
+        """Abandon the current voice turn."""
+        if self.voice_state in (VOICE_RECORDING, VOICE_TRANSCRIBING):
+            # Doesn't wait for the recording thread, and a V press right after starts a fresh one
+            self.ai_client.cancel_recording(self.voice_recording_id)
+        self.voice_state = None
+        self.voice_key_held = False
+        self.pending_transcript = None
+        self.input_text = ""
     
     def draw(self, screen):
         if self.active:
@@ -1134,12 +1370,22 @@ class DialogueSystem:
             input_surface = safe_render(self.input_text + cursor_char, font, TEXT_COLOR)
             screen.blit(input_surface, (self.input_rect.x + 15, self.input_rect.y + 15))
             
+            # Show that the NPC is working on a reply
+            if self.thinking:
+                dots = "." * (pygame.time.get_ticks() // 400 % 4)
+                thinking_surface = safe_render(f"{self.current_npc.name} is thinking{dots}", font, (255, 220, 150))
+                screen.blit(thinking_surface, (SCREEN_WIDTH - 260, 10))
+            
             # Create a single surface for the instruction text to avoid flickering
-            if self.voice_active:
-                instruction_text = "Listening... (speak clearly)"
+            if self.voice_state == VOICE_RECORDING and self.voice_key_held:
+                instruction_text = "Listening... (release V when done, ESC to cancel)"
+            elif self.voice_state == VOICE_RECORDING:
+                instruction_text = "Listening... (speak clearly, ESC to cancel)"
+            elif self.voice_active:
+                instruction_text = "Voice input: " + self.voice_state + "..."
             else:
                 if self.ai_client.asr_available:
-                    instruction_text = "Press ENTER to send, V or click mic to speak, ESC to exit"
+                    instruction_text = "Press ENTER to send, hold V or click mic to speak, ESC to exit"
                 else:
                     instruction_text = "Press ENTER to send, ESC to exit (Voice unavailable)"
                 
@@ -1165,24 +1411,20 @@ class DialogueSystem:
                 screen.blit(status_bg, (self.input_rect.x, status_y))
             
             # Draw voice recording indicator if active
-            if self.voice_active:
-                # Get a reference to the global variables
-                global recording_indicator_alpha
-                global recording_indicator_increasing
-                
+            if self.voice_state == VOICE_RECORDING:
                 # Create pulsing effect
-                if recording_indicator_increasing:
-                    recording_indicator_alpha += 5
-                    if recording_indicator_alpha >= 230:
-                        recording_indicator_increasing = False
+                if self.recording_indicator_increasing:
+                    self.recording_indicator_alpha += 5
+                    if self.recording_indicator_alpha >= 230:
+                        self.recording_indicator_increasing = False
                 else:
-                    recording_indicator_alpha -= 5
-                    if recording_indicator_alpha <= 100:
-                        recording_indicator_increasing = True
+                    self.recording_indicator_alpha -= 5
+                    if self.recording_indicator_alpha <= 100:
+                        self.recording_indicator_increasing = True
                         
                 # Draw recording indicator
                 recording_surface = pygame.Surface((SCREEN_WIDTH, 10), pygame.SRCALPHA)
-                recording_surface.fill((255, 0, 0, recording_indicator_alpha))
+                recording_surface.fill((255, 0, 0, self.recording_indicator_alpha))
                 screen.blit(recording_surface, (0, 0))
                 
                 # Draw "Recording..." text
@@ -1194,6 +1436,9 @@ class DialogueSystem:
             pygame.display.flip()  # Update the entire screen to avoid flicker
 
 def main():
+    if screen is None:
+        init_game()
+    
     # Set up dialogue
     hachiko_dialogue = {
         "default": [
@@ -1287,6 +1532,9 @@ def main():
     # Setup dialogue system
     dialogue_system = DialogueSystem()
     
+    # Pre-synthesize every scripted line in the background so it plays instantly when heard
+    dialogue_system.ai_client.warm_tts_cache({npc.name: npc.scripted_lines() for npc in npcs})
+    
     # Game state
     game_state = STATE_EXPLORING
     camera_x = 0
@@ -1299,15 +1547,21 @@ def main():
     
     # Main game loop
     running = True
-    recording_indicator_alpha = 0  # For pulsing effect
-    recording_indicator_increasing = True
     
     while running:
+        # Swap in the real Japanese font as soon as the background loader has it
+        if font_loader is not None:
+            install_font(font_loader.poll(), [dialogue_system.text_box])
+        
         # Handle events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             
+            # End-of-clip events wake the audio engine
+            if dialogue_system.ai_client.audio_engine.handle_event(event):
+                continue
+            
             if game_state == STATE_EXPLORING:
                 if event.type == pygame.KEYDOWN:
                     # Check for NPC interaction
@@ -1339,7 +1593,7 @@ def main():
                                 dialogue_system.activate(npc)
                                 game_state = STATE_DIALOGUE
                                 break
-            elif game_state == STATE_DIALOGUE:
+            elif game_state in (STATE_DIALOGUE, STATE_VOICE_INPUT):
                 dialogue_system.handle_input(event, player)
                 if not dialogue_system.active:
                     game_state = STATE_EXPLORING
@@ -1375,7 +1629,7 @@ def main():
         screen.fill(BG_COLOR)
         
         # Only render the game world when not in dialogue mode
-        if game_state != STATE_DIALOGUE:
+        if game_state == STATE_EXPLORING:
             # Draw background with camera offset
             screen.blit(background, (-camera_x, -camera_y))
             
@@ -1437,14 +1691,20 @@ def main():
                 screen.blit(progress_bg_surface, (5, 5))
                 screen.blit(progress_surface, (5 + 8, 5 + 8))  # Apply padding of 8px
         
+        # Apply any dialogue replies that arrived since the last frame
+        dialogue_system.update()
+        if game_state in (STATE_DIALOGUE, STATE_VOICE_INPUT):
+            game_state = STATE_VOICE_INPUT if dialogue_system.voice_active else STATE_DIALOGUE
+        
         # Draw dialogue system if active
-        if game_state == STATE_DIALOGUE:
+        if game_state in (STATE_DIALOGUE, STATE_VOICE_INPUT):
             dialogue_system.draw(screen)
         
         # Update display
         pygame.display.flip()
         clock.tick(60)
 
+    dialogue_system.ai_client.close_microphone()
     pygame.quit()
     sys.exit()
 